@@ -1,34 +1,82 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import networkx as nx
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import func, and_, cast, text, Interval
-from fastapi import APIRouter, Depends, BackgroundTasks
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import aliased
+from sqlalchemy import func, and_, cast, select, text, Interval, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from fastapi import APIRouter, BackgroundTasks, Query
 from backend.database_engine import (
     RealtimeLocationData,
     Events,
     UserEventSessions,
-    engine,
+    EventDetectionCheckpoint,
+    get_sessionmaker,
 )
+from backend.services.proximity import stream_proximity_pairs
+from backend.services.grouping import group_edges
+from backend.services.report_cache import report_cache
+from backend.services import interaction_rollup, copresence
 
 router = APIRouter()
 
-# Dependency for DB session
-def get_db():
-    db = Session(bind=engine)
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # --- Thresholds ---
 DISTANCE_THRESHOLD_FEET = 6.0
 DURATION_THRESHOLD_SECONDS = 60
 EVENT_GAP_SECONDS = 60
 
+# --- Consolidation ---
+# "overlap": a group continues the active event whose recent members it
+#            overlaps most (Jaccard >= MEMBERSHIP_MIN_JACCARD), so one
+#            person joining or leaving does not split the event; each
+#            user's join/leave times become their own session
+# "exact":   one event per exact set of users (legacy)
+CONSOLIDATION_MODE = "overlap"
+MEMBERSHIP_MIN_JACCARD = 0.5
+
+# --- Proximity engine ---
+# "grid": stream the window once and pair samples in memory (spatial hash)
+# "sql":  legacy self-join of realtime_location_data inside Postgres
+PROXIMITY_ENGINE = "grid"
+PROXIMITY_FETCH_CHUNK_ROWS = 200_000
+
+# --- Statement timeout ---
+# Detection runs lift the pool-wide statement timeout for their transaction
+# (0 = no limit)
+DETECTION_STATEMENT_TIMEOUT_MS = 0
+
+# --- Incremental mode ---
+CHECKPOINT_NAME = "default"
+# Samples are not committed in time order (writer threads, flush latency,
+# downsampler windows), so the high-water mark stays this far behind now()
+INCREMENTAL_LATENESS_SEC = 5
+
+# --- Parallel mode ---
+# Worker processes (None = one per core); each gets a few shards so an
+# unusually busy stretch of the window does not leave the others idle
+PARALLEL_WORKERS = None
+SHARDS_PER_WORKER = 2
+
+
+# --------------------------- TIME WINDOW ---------------------------
+def window_filter(column, time_window='7 days', since=None, until=None):
+    """
+    Conditions selecting [since, until) on `column`. Without an explicit
+    `since`, the window is the last `time_window` before now().
+    """
+    if since is None:
+        conditions = [column >= func.now() - cast(text(f"INTERVAL '{time_window}'"), Interval)]
+    else:
+        conditions = [column >= since]
+
+    if until is not None:
+        conditions.append(column < until)
+    return conditions
+
 
 # --------------------------- PROXIMITY LOGIC (NO POSTGIS) ---------------------------
-def get_proximity_data_bucketed(session, time_window='7 days', downsample_interval=1):
+def get_proximity_data_bucketed(session, time_window='7 days', downsample_interval=1, since=None, until=None):
 
     bucket = int(downsample_interval)
     dist = float(DISTANCE_THRESHOLD_FEET)
@@ -47,7 +95,7 @@ def get_proximity_data_bucketed(session, time_window='7 days', downsample_interv
             a.recorded_at.label("recorded_at"),
             bucket_a,
         )
-        .filter(a.recorded_at >= func.now() - cast(text(f"INTERVAL '{time_window}'"), Interval))
+        .filter(*window_filter(a.recorded_at, time_window, since, until))
         .subquery()
     )
 
@@ -59,7 +107,7 @@ def get_proximity_data_bucketed(session, time_window='7 days', downsample_interv
             b.recorded_at.label("recorded_at"),
             bucket_b,
         )
-        .filter(b.recorded_at >= func.now() - cast(text(f"INTERVAL '{time_window}'"), Interval))
+        .filter(*window_filter(b.recorded_at, time_window, since, until))
         .subquery()
     )
 
@@ -89,130 +137,652 @@ def get_proximity_data_bucketed(session, time_window='7 days', downsample_interv
     return pd.read_sql(query.statement, session.bind)
 
 
-# --------------------------- EVENT GROUPING ---------------------------
-def group_connected_events(df):
-    grouped = df.groupby("recorded_at")
-    event_counter = 1
-    events = []
+def get_proximity_data_grid(session, time_window='7 days', downsample_interval=1, since=None, until=None):
 
-    for ts, group in grouped:
-        G = nx.Graph()
-        G.add_edges_from(zip(group["user_a"], group["user_b"]))
+    bucket = int(downsample_interval)
+    r = RealtimeLocationData
+
+    query = (
+        session.query(
+            r.id.label("id"),
+            r.x_coordinate.label("x"),
+            r.y_coordinate.label("y"),
+            r.recorded_at.label("recorded_at"),
+            func.floor(func.extract('epoch', r.recorded_at) / bucket).label("bucket"),
+        )
+        .filter(*window_filter(r.recorded_at, time_window, since, until))
+        .order_by(text("bucket"))
+    )
+
+    # Server-side cursor so the window is streamed instead of loaded at once
+    # (an option on the statement, not the session's connection, which
+    # would keep using server-side cursors for the inserts that follow)
+    chunks = pd.read_sql(
+        query.statement.execution_options(stream_results=True),
+        session.connection(),
+        chunksize=PROXIMITY_FETCH_CHUNK_ROWS,
+    )
+    return stream_proximity_pairs(chunks, float(DISTANCE_THRESHOLD_FEET))
 
-        for component in nx.connected_components(G):
-            if len(component) < 2:
-                continue
-            events.append({
-                "event_id": event_counter,
-                "timestamp": ts,
-                "users": list(component)
-            })
-            event_counter += 1
 
-    return events
+def get_proximity_data(session, time_window='7 days', downsample_interval=1, proximity_engine=None,
+                       since=None, until=None):
+    proximity_engine = proximity_engine or PROXIMITY_ENGINE
+
+    if proximity_engine == "sql":
+        return get_proximity_data_bucketed(session, time_window, downsample_interval, since, until)
+    if proximity_engine == "grid":
+        return get_proximity_data_grid(session, time_window, downsample_interval, since, until)
+    raise ValueError(f"Unknown proximity engine: {proximity_engine}")
+
+
+# --------------------------- EVENT GROUPING ---------------------------
+def group_connected_events(df):
+    return group_edges(df["recorded_at"], df["user_a"], df["user_b"])
 
 
 # --------------------------- EVENT CONSOLIDATION ---------------------------
-def consolidate_events(events):
-    consolidated = []
-    active = {}
+def _sweep(active, cutoff, consolidated):
+    # Close the active events last seen before `cutoff`; no later group can
+    # extend them, so memory stays bounded to the groups seen recently
+    for key, event in list(active.items()):
+        if event["end_time"] < cutoff:
+            consolidated.append(active.pop(key))
+
+
+def _consolidate_exact(events, active, consolidated):
+    # One event per exact set of users
+    gap = timedelta(seconds=EVENT_GAP_SECONDS)
+    next_sweep = None
 
     for e in events:
+        now = e["timestamp"]
+        if next_sweep is None or now >= next_sweep:
+            _sweep(active, now - gap, consolidated)
+            next_sweep = now + gap
+
         key = tuple(sorted(e["users"]))
+        event = active.get(key)
+        if event is not None and (now - event["end_time"]).total_seconds() <= EVENT_GAP_SECONDS:
+            event["end_time"] = now
+            continue
+
+        if event is not None:
+            consolidated.append(active.pop(key))
+        active[key] = {
+            "event_id": e["event_id"],
+            "start_time": now,
+            "end_time": now,
+            "users": e["users"],
+        }
+
 
-        if key not in active:
+def _recent_members(event, cutoff):
+    return {u for u, _, end in event["sessions"] if end >= cutoff}
+
+
+def _join(event, users, now, cutoff):
+    """Extend `event` to `now` with `users` present; a user back after EVENT_GAP_SECONDS gets a new session."""
+    latest = {session[0]: session for session in event["sessions"]}
+    for u in users:
+        session = latest.get(u)
+        if session is not None and session[2] >= cutoff:
+            session[2] = now
+        else:
+            event["sessions"].append([u, now, now])
+    event["end_time"] = now
+    event["users"] = sorted({*event["users"], *users})
+
+
+def _consolidate_overlap(events, active, consolidated):
+    # Active events are keyed by event_id; a group continues the unclaimed
+    # event whose recent members it overlaps most
+    gap = timedelta(seconds=EVENT_GAP_SECONDS)
+    next_sweep = None
+    member_of = {}
+    for key, event in active.items():
+        if "sessions" not in event:
+            # Carried over from exact mode: everyone spanned the event
+            event["sessions"] = [list(session) for session in event_sessions(event)]
+            event["founders"] = sorted(event["users"])
+        for u in event["users"]:
+            member_of.setdefault(u, set()).add(key)
+
+    claimed, claimed_at = set(), None
+    for e in events:
+        now = e["timestamp"]
+        cutoff = now - gap
+        if now != claimed_at:
+            # Each event continues at most one group per timestamp
+            claimed, claimed_at = set(), now
+        if next_sweep is None or now >= next_sweep:
+            swept_from = len(consolidated)
+            _sweep(active, cutoff, consolidated)
+            for event in consolidated[swept_from:]:
+                for u in event["users"]:
+                    member_of[u].discard(event["event_id"])
+            next_sweep = now + gap
+
+        users = set(e["users"])
+        best, best_score = None, 0.0
+        for key in sorted(set().union(*(member_of.get(u, ()) for u in users)) - claimed):
+            event = active[key]
+            if event["end_time"] < cutoff:
+                continue
+            recent = _recent_members(event, cutoff)
+            score = len(users & recent) / len(users | recent)
+            if score > best_score:
+                best, best_score = key, score
+
+        if best is not None and best_score >= MEMBERSHIP_MIN_JACCARD:
+            key = best
+            _join(active[key], users, now, cutoff)
+        else:
+            key = e["event_id"]
             active[key] = {
                 "event_id": e["event_id"],
-                "start_time": e["timestamp"],
-                "end_time": e["timestamp"],
-                "users": e["users"],
+                "start_time": now,
+                "end_time": now,
+                "users": sorted(users),
+                # Fixed for the event's lifetime, unlike users (see event_key)
+                "founders": sorted(users),
+                "sessions": [[u, now, now] for u in sorted(users)],
             }
-        else:
-            last = active[key]["end_time"]
-            if (e["timestamp"] - last).total_seconds() <= EVENT_GAP_SECONDS:
-                active[key]["end_time"] = e["timestamp"]
-            else:
-                consolidated.append(active.pop(key))
-                active[key] = {
-                    "event_id": e["event_id"],
-                    "start_time": e["timestamp"],
-                    "end_time": e["timestamp"],
-                    "users": e["users"],
-                }
+
+        claimed.add(key)
+        for u in users:
+            member_of.setdefault(u, set()).add(key)
+
+
+def _consolidate_into(events, active, consolidated):
+    if CONSOLIDATION_MODE == "exact":
+        _consolidate_exact(events, active, consolidated)
+    elif CONSOLIDATION_MODE == "overlap":
+        _consolidate_overlap(events, active, consolidated)
+    else:
+        raise ValueError(f"Unknown consolidation mode: {CONSOLIDATION_MODE}")
+
+
+def _active_key(event):
+    return event["event_id"] if CONSOLIDATION_MODE == "overlap" else tuple(sorted(event["users"]))
+
+
+def event_sessions(event):
+    """(user, start, end) per participant session; without per-user times each user spans the event."""
+    if "sessions" in event:
+        return [(int(u), start, end) for u, start, end in event["sessions"]]
+    return [(int(u), event["start_time"], event["end_time"]) for u in event["users"]]
+
+
+def consolidate_events(events):
+    consolidated = []
+    active = {}
+
+    _consolidate_into(events, active, consolidated)
 
     consolidated.extend(active.values())
-    return consolidated
+    # Start order, so the sharded run (stitch_shards) inserts in the same order
+    return sorted(consolidated, key=lambda e: e["event_id"])
+
+
+def closed_events(events, high_water):
+    """
+    Events more than EVENT_GAP_SECONDS older than `high_water`. A later
+    sample may still extend the others, and their key is taken once
+    written, so full runs leave them to the next run.
+    """
+    return [e for e in events if (high_water - e["end_time"]).total_seconds() > EVENT_GAP_SECONDS]
+
+
+def consolidate_events_incremental(events, open_events, high_water):
+    """
+    Continue consolidation from the `open_events` left by the previous run.
+    Returns (closed, still_open): an event is closed once `high_water` is more
+    than EVENT_GAP_SECONDS past its end, since no later sample can extend it.
+    """
+    # Raw ids restart at 1 on every grouping call; move them past the open
+    # events' ids so a new event never takes over an open one's key
+    last_open = max((e["event_id"] for e in open_events), default=0)
+    first_raw = min((e["event_id"] for e in events), default=last_open + 1)
+    if first_raw <= last_open:
+        offset = last_open - first_raw + 1
+        events = [{**e, "event_id": e["event_id"] + offset} for e in events]
+
+    consolidated = []
+    active = {_active_key(e): e for e in open_events}
+
+    _consolidate_into(events, active, consolidated)
+
+    for key, event in list(active.items()):
+        if (high_water - event["end_time"]).total_seconds() > EVENT_GAP_SECONDS:
+            consolidated.append(active.pop(key))
+
+    return consolidated, list(active.values())
 
 
 # --------------------------- NEW CENTROID (X/Y AVERAGE) ---------------------------
-def get_numeric_centroid(session, start_time, end_time, user_ids):
+CENTROID_SQL = text("""
+    SELECT w.idx, AVG(r.x_coordinate) AS x, AVG(r.y_coordinate) AS y
+    FROM unnest(
+        CAST(:idx AS integer[]),
+        CAST(:user_ids AS integer[]),
+        CAST(:starts AS timestamptz[]),
+        CAST(:ends AS timestamptz[])
+    ) AS w(idx, user_id, start_time, end_time)
+    JOIN realtime_location_data r
+      ON r.id = w.user_id
+     AND r.recorded_at BETWEEN w.start_time AND w.end_time
+    GROUP BY w.idx
+""")
+
+
+def get_numeric_centroids(session, events):
+    """
+    Average x/y of every event's participants over [start_time, end_time],
+    for all events in a single query. Returns {position in events: (x, y)};
+    events without samples are missing from the result.
+    """
+    idx, user_ids, starts, ends = [], [], [], []
+    for i, event in enumerate(events):
+        start = pd.Timestamp(event["start_time"]).to_pydatetime()
+        end = pd.Timestamp(event["end_time"]).to_pydatetime()
+        for user_id in event["users"]:
+            idx.append(i)
+            user_ids.append(int(user_id))
+            starts.append(start)
+            ends.append(end)
+
+    if not idx:
+        return {}
 
-    result = session.query(
-        func.avg(RealtimeLocationData.x_coordinate),
-        func.avg(RealtimeLocationData.y_coordinate),
-    ).filter(
-        RealtimeLocationData.id.in_(user_ids),
-        RealtimeLocationData.recorded_at.between(start_time, end_time),
-    ).first()
+    rows = session.execute(
+        CENTROID_SQL,
+        {"idx": idx, "user_ids": user_ids, "starts": starts, "ends": ends},
+    ).fetchall()
 
-    if result and result[0] and result[1]:
-        return float(result[0]), float(result[1])
-    return None, None
+    return {
+        r.idx: (float(r.x), float(r.y))
+        for r in rows
+        if r.x is not None and r.y is not None
+    }
 
 
 # --------------------------- INSERT EVENTS ---------------------------
-def insert_events(session, consolidated_events):
+def event_key(event):
+    """
+    Idempotency key for an event: start time plus sorted participants. Overlap
+    events use the users they started with, since users grows as people join
+    and a re-run would otherwise write the same event again.
+    """
+    users = ",".join(str(u) for u in sorted(int(u) for u in event.get("founders", event["users"])))
+    # In UTC, so the same instant gives the same key whatever the writer's
+    # session timezone; naive times are UTC, as written by ingestion
+    start = pd.Timestamp(event["start_time"])
+    start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+    return f"{start.isoformat()}|{users}"
+
+
+def write_events(session, events):
+    """
+    Bulk-write events that already carry x_event/y_event: one multi-row
+    INSERT ... ON CONFLICT DO NOTHING RETURNING for the events, then one
+    batch for their participant sessions. Events whose key already exists
+    are skipped, so re-running detection does not duplicate rows; callers
+    pass only closed events (see closed_events), so a skipped key never
+    hides a longer version of the event. The new
+    sessions are added to the daily interaction rollup and the co-presence
+    index in the same transaction.
+    Returns the newly written events with their event_id.
+    """
+    by_key = {}
+    for event in events:
+        by_key.setdefault(event_key(event), event)
+
+    if not by_key:
+        return []
+
+    event_rows = [
+        {
+            "start_time": event["start_time"],
+            "end_time": event["end_time"],
+            "x_event": event["x_event"],
+            "y_event": event["y_event"],
+            "event_key": key,
+            "participant_count": len({int(u) for u in event["users"]}),
+        }
+        for key, event in by_key.items()
+    ]
 
+    stmt = (
+        pg_insert(Events)
+        .on_conflict_do_nothing(index_elements=[Events.event_key])
+        .returning(Events.event_id, Events.event_key)
+    )
+    inserted = session.execute(stmt, event_rows).fetchall()
+
+    written = []
+    session_rows = []
+    for event_id, key in inserted:
+        event = by_key[key]
+        written.append({**event, "event_id": event_id})
+        for user_id, start_time, end_time in event_sessions(event):
+            session_rows.append({
+                "id": user_id,
+                "event_id": event_id,
+                "start_time": start_time,
+                "end_time": end_time,
+            })
+
+    if session_rows:
+        session.execute(insert(UserEventSessions), session_rows)
+        event_ids = [e["event_id"] for e in written]
+        interaction_rollup.add_events(session, event_ids)
+        copresence.add_events(session, event_ids)
+
+    return written
+
+
+def locate_events(session, consolidated_events, centroids=get_numeric_centroids):
+    """
+    Events long enough to keep, with their centroid as x_event/y_event.
+    `centroids(session, events)` is swappable for sources other than Postgres.
+    """
     valid_events = [
         e for e in consolidated_events
         if (e["end_time"] - e["start_time"]).total_seconds() >= DURATION_THRESHOLD_SECONDS
     ]
 
-    for event in valid_events:
-
-        x_centroid, y_centroid = get_numeric_centroid(
-            session,
-            event["start_time"],
-            event["end_time"],
-            event["users"],
-        )
+    found = centroids(session, valid_events)
 
-        if x_centroid is None:
+    located = []
+    for i, event in enumerate(valid_events):
+        if i not in found:
             continue
+        x_centroid, y_centroid = found[i]
+        located.append({**event, "x_event": int(x_centroid), "y_event": int(y_centroid)})
+    return located
 
-        orm_event = Events(
-            start_time=event["start_time"],
-            end_time=event["end_time"],
-            x_event=int(x_centroid),
-            y_event=int(y_centroid),
-        )
 
-        session.add(orm_event)
-        session.flush()
+def insert_events(session, consolidated_events, commit=True):
+    located = locate_events(session, consolidated_events)
+    written = write_events(session, located)
+
+    if commit:
+        session.commit()
+        invalidate_reports(written)
+    return written
 
-        for user_id in event["users"]:
-            session.add(
-                UserEventSessions(
-                    id=user_id,
-                    event_id=orm_event.event_id,
-                    start_time=event["start_time"],
-                    end_time=event["end_time"],
-                )
-            )
 
-    session.commit()
+def invalidate_reports(written):
+    # New user_event_sessions rows make these users' cached reports stale
+    report_cache.invalidate({int(u) for e in written for u in e["users"]})
 
 
 # --------------------------- MAIN ---------------------------
-def run_event_detection(time_window="7 days", downsample_interval=1):
-    with Session(engine) as db:
-        df = get_proximity_data_bucketed(db, time_window, downsample_interval)
+def lift_statement_timeout(db):
+    db.execute(text(f"SET LOCAL statement_timeout = {int(DETECTION_STATEMENT_TIMEOUT_MS)}"))
+
+
+def run_event_detection(time_window="7 days", downsample_interval=1, proximity_engine=None):
+    with get_sessionmaker()() as db:
+        lift_statement_timeout(db)
+        now = db.execute(select(func.now())).scalar()
+        df = get_proximity_data(db, time_window, downsample_interval, proximity_engine)
         if df.empty:
             return "no_data"
 
         raw = group_connected_events(df)
-        consolidated = consolidate_events(raw)
+        consolidated = closed_events(consolidate_events(raw), now)
+
+        if not consolidated:
+            return "no_events"
+
+        insert_events(db, consolidated)
+        return "success"
+
+
+# --------------------------- INCREMENTAL MODE ---------------------------
+def _bucket_floor(ts, bucket):
+    epoch = int(ts.timestamp() // bucket) * bucket
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _dump_open_events(events):
+    return [
+        {
+            "event_id": int(e["event_id"]),
+            "start_time": pd.Timestamp(e["start_time"]).isoformat(),
+            "end_time": pd.Timestamp(e["end_time"]).isoformat(),
+            "users": [int(u) for u in e["users"]],
+            **({"founders": [int(u) for u in e["founders"]]} if "founders" in e else {}),
+            **({"sessions": [
+                [int(u), pd.Timestamp(start).isoformat(), pd.Timestamp(end).isoformat()]
+                for u, start, end in e["sessions"]
+            ]} if "sessions" in e else {}),
+        }
+        for e in events
+    ]
+
+
+def _load_open_events(data):
+    return [
+        {
+            "event_id": e["event_id"],
+            "start_time": pd.Timestamp(e["start_time"]),
+            "end_time": pd.Timestamp(e["end_time"]),
+            "users": e["users"],
+            **({"founders": e["founders"]} if "founders" in e else {}),
+            **({"sessions": [
+                [u, pd.Timestamp(start), pd.Timestamp(end)] for u, start, end in e["sessions"]
+            ]} if "sessions" in e else {}),
+        }
+        for e in data or []
+    ]
+
+
+def run_incremental_event_detection(time_window="7 days", downsample_interval=1, proximity_engine=None):
+    """
+    Process only samples newer than the stored high-water mark. The first run
+    (no checkpoint yet) starts `time_window` back. Only complete buckets at
+    least INCREMENTAL_LATENESS_SEC old are processed, so samples still being
+    written are picked up next run. The checkpoint row is created first if
+    missing and then locked, so concurrent runs, the first one included,
+    process a range one after the other.
+    """
+    bucket = int(downsample_interval)
+
+    with get_sessionmaker()() as db:
+        lift_statement_timeout(db)
+        # A missing row cannot be locked; create it as "nothing processed yet"
+        db.execute(
+            pg_insert(EventDetectionCheckpoint)
+            .values(
+                name=CHECKPOINT_NAME,
+                last_recorded_at=func.now() - cast(text(f"INTERVAL '{time_window}'"), Interval),
+                open_events=[],
+            )
+            .on_conflict_do_nothing(index_elements=[EventDetectionCheckpoint.name])
+        )
+        checkpoint = db.get(EventDetectionCheckpoint, CHECKPOINT_NAME, with_for_update=True)
+
+        latest = db.query(func.max(RealtimeLocationData.recorded_at)).scalar()
+        if latest is None:
+            return "no_data"
+
+        now = db.execute(select(func.now())).scalar()
+        until = _bucket_floor(min(latest, now - timedelta(seconds=INCREMENTAL_LATENESS_SEC)), bucket)
+        since = checkpoint.last_recorded_at
+
+        if until <= since:
+            return "no_new_data"
+
+        df = get_proximity_data(
+            db, time_window, downsample_interval, proximity_engine,
+            since=since, until=until,
+        )
+        raw = group_connected_events(df) if not df.empty else []
+
+        open_events = _load_open_events(checkpoint.open_events)
+        closed, still_open = consolidate_events_incremental(raw, open_events, until)
+
+        written = insert_events(db, closed, commit=False) if closed else []
+
+        checkpoint.last_recorded_at = until
+        checkpoint.open_events = _dump_open_events(still_open)
+
+        # Events and high-water mark commit together, so a crash never
+        # re-inserts or skips a range
+        db.commit()
+        invalidate_reports(written)
+        return "success"
+
+
+# --------------------------- PARALLEL MODE ---------------------------
+def shard_bounds(since, until, shards, bucket=1):
+    """
+    Split [since, until) into up to `shards` consecutive ranges. Inner
+    boundaries fall on bucket edges, so no proximity bucket (and no
+    timestamp) is split between shards.
+    """
+    step = (until - since).total_seconds() / max(int(shards), 1)
+    bounds = [since]
+    for k in range(1, int(shards)):
+        edge = _bucket_floor(since + timedelta(seconds=k * step), bucket)
+        if bounds[-1] < edge < until:
+            bounds.append(edge)
+    bounds.append(until)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def consolidate_shard(raw, until):
+    """
+    Consolidate one shard's groups. Events ending within EVENT_GAP_SECONDS
+    of `until` are returned as still open, since the next shard may extend
+    them; `until=None` (last shard) leaves every final chain open. In
+    overlap mode the raw groups are returned as they are (as closed): which
+    event a group continues depends on every earlier group, so
+    stitch_shards consolidates them in one pass.
+    """
+    if CONSOLIDATION_MODE == "overlap":
+        return raw, []
+    if until is None:
+        consolidated = []
+        active = {}
+        _consolidate_into(raw, active, consolidated)
+        return consolidated, list(active.values())
+    return consolidate_events_incremental(raw, [], until)
+
+
+def stitch_shards(shards):
+    """
+    Merge per-shard results [(raw_count, closed, still_open, until)] (in time
+    order) into the events consolidate_events would give for the whole
+    window. Raw event ids are renumbered as if grouped in one pass, and an
+    open event is joined to the same users' first event in a later shard
+    when the gap between them is at most EVENT_GAP_SECONDS.
+    Returns the events ordered by event_id.
+    """
+    if CONSOLIDATION_MODE == "overlap":
+        raw, offset = [], 0
+        for raw_count, groups, _, _ in shards:
+            raw.extend({**e, "event_id": e["event_id"] + offset} for e in groups)
+            offset += raw_count
+        return consolidate_events(raw)
+
+    consolidated = []
+    carry = {}
+    offset = 0
+
+    for raw_count, closed, still_open, until in shards:
+        closed = [{**e, "event_id": e["event_id"] + offset} for e in closed]
+        still_open = [{**e, "event_id": e["event_id"] + offset} for e in still_open]
+        offset += raw_count
+
+        first = {}
+        for events in (closed, still_open):
+            for i, e in enumerate(events):
+                key = tuple(sorted(e["users"]))
+                if key not in first or e["start_time"] < first[key][0][first[key][1]]["start_time"]:
+                    first[key] = (events, i)
+
+        for key, event in carry.items():
+            if key in first:
+                events, i = first.pop(key)
+                if (events[i]["start_time"] - event["end_time"]).total_seconds() <= EVENT_GAP_SECONDS:
+                    events[i] = {**event, "end_time": events[i]["end_time"]}
+                    continue
+                consolidated.append(event)
+            elif until is None or (until - event["end_time"]).total_seconds() > EVENT_GAP_SECONDS:
+                consolidated.append(event)
+            else:
+                # This shard is shorter than the gap; the next one may still extend it
+                still_open.append(event)
+
+        consolidated.extend(closed)
+        carry = {tuple(sorted(e["users"])): e for e in still_open}
+
+    consolidated.extend(carry.values())
+    return sorted(consolidated, key=lambda e: e["event_id"])
+
+
+def detect_shard(since, until, downsample_interval=1, proximity_engine=None):
+    """Proximity, grouping and consolidation for [since, until); runs in a worker process."""
+    with get_sessionmaker()() as db:
+        lift_statement_timeout(db)
+        df = get_proximity_data(
+            db, downsample_interval=downsample_interval, proximity_engine=proximity_engine,
+            since=since, until=until,
+        )
+    raw = group_connected_events(df) if not df.empty else []
+    closed, still_open = consolidate_shard(raw, until)
+    return len(raw), closed, still_open, until
+
+
+def run_shards(fn, shard_args, workers=None):
+    """Run fn(*args) for every shard in a process pool; results in shard order."""
+    workers = min(workers or PARALLEL_WORKERS or os.cpu_count() or 1, len(shard_args))
+    if workers <= 1:
+        return [fn(*args) for args in shard_args]
+
+    # spawn: workers must not inherit the parent's pooled DB connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(fn, *args) for args in shard_args]
+        return [f.result() for f in futures]
+
+
+def run_parallel_event_detection(time_window="7 days", downsample_interval=1, proximity_engine=None,
+                                 workers=None):
+    """
+    Same events as run_event_detection, with the window split into time
+    shards that run proximity, grouping and consolidation in separate
+    processes. Centroids and inserts run once in this process.
+    """
+    bucket = int(downsample_interval)
+    workers = workers or PARALLEL_WORKERS or os.cpu_count() or 1
+
+    with get_sessionmaker()() as db:
+        lift_statement_timeout(db)
+        now, since = db.execute(
+            select(func.now(), func.now() - cast(text(f"INTERVAL '{time_window}'"), Interval))
+        ).first()
+        latest = db.query(func.max(RealtimeLocationData.recorded_at)).filter(
+            RealtimeLocationData.recorded_at >= since
+        ).scalar()
+        if latest is None:
+            return "no_data"
+
+        bounds = shard_bounds(since, latest + timedelta(seconds=bucket), workers * SHARDS_PER_WORKER, bucket)
+        # Last shard is open-ended, like the serial query
+        shard_args = [
+            (start, None if k == len(bounds) - 1 else end, downsample_interval, proximity_engine)
+            for k, (start, end) in enumerate(bounds)
+        ]
+        results = run_shards(detect_shard, shard_args, workers)
+
+        if not any(raw_count for raw_count, *_ in results):
+            return "no_data"
 
+        consolidated = closed_events(stitch_shards(results), now)
         if not consolidated:
             return "no_events"
 
@@ -222,6 +792,17 @@ def run_event_detection(time_window="7 days", downsample_interval=1):
 
 # --------------------------- API ROUTE ---------------------------
 @router.post("/run-event-detection")
-async def run_event_detection_route(background_tasks: BackgroundTasks):
-    background_tasks.add_task(run_event_detection)
+async def run_event_detection_route(
+    background_tasks: BackgroundTasks,
+    proximity_engine: str = Query(None, pattern="^(grid|sql)$"),
+    incremental: bool = False,
+    parallel: bool = False,
+):
+    if incremental:
+        task = run_incremental_event_detection
+    elif parallel:
+        task = run_parallel_event_detection
+    else:
+        task = run_event_detection
+    background_tasks.add_task(task, proximity_engine=proximity_engine)
     return {"message": "Event detection started!"}
@@ -1,28 +1,25 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.database_engine import (
-    engine,
+    get_engine,
+    get_async_engine,
+    get_db,
+    get_async_db,
     NametoUID,
     UserEventSessions,
-    Events,
-    RealtimeLocationData
+    UserDailyInteraction,
+    Events
 )
-from sqlalchemy import func, text
-from datetime import datetime, timedelta
+from sqlalchemy import func, text, select
+from backend.services.copresence import social_graph
+from backend.services.overview import overview_snapshot
+from backend.services.live_events import live_events
+from backend.services import tag_health
+from datetime import datetime
 
 router = APIRouter()
 
-# -----------------------------
-# DB SESSION DEPENDENCY
-# -----------------------------
-def get_db():
-    db = Session(bind=engine)
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # -----------------------------
 # LOOKUP USER ID BY NAME
 # -----------------------------
@@ -38,28 +35,26 @@ def lookup_user_id(name: str, db: Session = Depends(get_db)):
 # USER INTERACTION LOOKUP
 # -----------------------------
 @router.get("/users")
-def get_user_data(user_id: int, db: Session = Depends(get_db)):
+async def get_user_data(user_id: int, db: AsyncSession = Depends(get_async_db)):
 
     # Total interaction time from new column
-    total_hours = (
-        db.query(func.coalesce(func.sum(UserEventSessions.duration_hours), 0.0))
-        .filter(UserEventSessions.id == user_id)
-        .scalar()
+    total_hours = await db.scalar(
+        select(func.coalesce(func.sum(UserEventSessions.duration_hours), 0.0))
+        .where(UserEventSessions.id == user_id)
     )
 
     # Last 3 interactions
-    recent_interactions = (
-        db.query(
+    recent_interactions = (await db.execute(
+        select(
             UserEventSessions,
             Events.x_event,
             Events.y_event
         )
         .join(Events, Events.event_id == UserEventSessions.event_id, isouter=True)
-        .filter(UserEventSessions.id == user_id)
+        .where(UserEventSessions.id == user_id)
         .order_by(UserEventSessions.end_time.desc())
         .limit(3)
-        .all()
-    )
+    )).all()
 
     # Format interactions
     results = []
@@ -90,33 +85,54 @@ def get_user_data(user_id: int, db: Session = Depends(get_db)):
 # ACTIVE DEVICES (LAST HOUR)
 # -----------------------------
 @router.get("/active-devices")
-def active_devices(db: Session = Depends(get_db)):
-    one_hour_ago = datetime.now() - timedelta(hours=1)
-
-    active_count = (
-        db.query(func.count(func.distinct(RealtimeLocationData.id)))
-            .filter(RealtimeLocationData.recorded_at >= one_hour_ago)
-            .scalar()
-    )
+async def active_devices(window_minutes: float = Query(60, gt=0), db: AsyncSession = Depends(get_async_db)):
+    # One row per tag (tag_last_seen), not a scan of the hour's samples
+    active_count = await db.run_sync(tag_health.active_count, window_minutes * 60)
 
     return {"active_devices": active_count or 0}
 
 
+# -----------------------------
+# TAG HEALTH (STALE / OFFLINE TAGS)
+# -----------------------------
+@router.get("/tag-health")
+def get_tag_health(stale_minutes: float = Query(5, gt=0), db: Session = Depends(get_db)):
+    tags = tag_health.tag_health(db, stale_minutes * 60)
+    return {
+        "online": sum(1 for t in tags if t["status"] == "online"),
+        "stale": sum(1 for t in tags if t["status"] == "stale"),
+        "never_seen": sum(1 for t in tags if t["status"] == "never_seen"),
+        "tags": tags,
+    }
+
+
 # -----------------------------
 # EVENTS TODAY
 # -----------------------------
 @router.get("/events-today")
-def events_today(db: Session = Depends(get_db)):
+async def events_today(db: AsyncSession = Depends(get_async_db)):
 
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
-    event_count = (
-        db.query(func.count(Events.event_id))
-        .filter(Events.start_time >= today_start)
-        .scalar()
+    event_count = await db.scalar(
+        select(func.count(Events.event_id))
+        .where(Events.start_time >= today_start)
     )
 
-    return {"events_today": event_count or 0}
+    # Events still open in the streaming detector are not written yet
+    return {"events_today": event_count or 0, "events_in_progress": len(live_events.active())}
+
+
+# -----------------------------
+# LIVE EVENTS
+# -----------------------------
+@router.get("/live-events")
+def get_live_events():
+    """Events the streaming detector has open (already DURATION_THRESHOLD_SECONDS long)."""
+    return {
+        "live": live_events.connected,
+        "events": live_events.active(),
+    }
 
 
 # -----------------------------
@@ -131,35 +147,64 @@ def system_status(db: Session = Depends(get_db)):
         return {"status": "offline"}
 
 
+# -----------------------------
+# DASHBOARD OVERVIEW (SNAPSHOT)
+# -----------------------------
+@router.get("/overview")
+def get_overview(request: Request, response: Response, threshold_hours: float = Query(5.0)):
+    """Active devices, events today, status and low-interaction users in one response."""
+    body, etag = overview_snapshot.overview(float(threshold_hours))
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return body
+
+
+# -----------------------------
+# CONNECTION POOL METRICS
+# -----------------------------
+@router.get("/pool-metrics")
+def pool_metrics():
+    async_pool = get_async_engine().pool
+    return {
+        **get_engine().pool.metrics(),
+        "async_checked_out": async_pool.checkedout(),
+        "async_overflow": async_pool.overflow(),
+    }
+
+
 # -----------------------------
 # LOW INTERACTION USERS
 # -----------------------------
 @router.get("/low-interaction")
-def get_low_interaction_users(threshold_hours: float = Query(0.01), db: Session = Depends(get_db)):
+async def get_low_interaction_users(threshold_hours: float = Query(0.01), db: AsyncSession = Depends(get_async_db)):
 
+    # Totals come from the daily rollup (one row per user per day)
     subq = (
-        db.query(
-            UserEventSessions.id.label("user_id"),
-            func.coalesce(func.sum(UserEventSessions.duration_hours), 0.0).label("total_hours"),
+        select(
+            UserDailyInteraction.user_id.label("user_id"),
+            (func.coalesce(func.sum(UserDailyInteraction.interaction_seconds), 0.0) / 3600).label("total_hours"),
         )
-        .group_by(UserEventSessions.id)
+        .group_by(UserDailyInteraction.user_id)
         .subquery()
     )
 
     # VERY IMPORTANT: force threshold_hours to float
     threshold = float(threshold_hours)
 
-    results = (
-        db.query(
+    results = (await db.execute(
+        select(
             NametoUID.name,
             subq.c.user_id,
             subq.c.total_hours,
         )
         .join(NametoUID, NametoUID.id == subq.c.user_id)
-        .filter(subq.c.total_hours < threshold)        # <-- MUST be a comparison
+        .where(subq.c.total_hours < threshold)        # <-- MUST be a comparison
         .order_by(subq.c.total_hours.asc())
-        .all()
-    )
+    )).all()
 
     return [
         {
@@ -172,6 +217,36 @@ def get_low_interaction_users(threshold_hours: float = Query(0.01), db: Session
 
 
 
+# -----------------------------
+# SOCIAL GRAPH (WHOLE FACILITY)
+# -----------------------------
+@router.get("/social-graph")
+def get_social_graph(
+    min_minutes: float = Query(0.0, ge=0),
+    limit: int = Query(5000, ge=1, le=50_000),
+    db: Session = Depends(get_db),
+):
+    edges = social_graph(db, min_seconds=min_minutes * 60, limit=limit)
+
+    user_ids = {r.user_a for r in edges} | {r.user_b for r in edges}
+    names = dict(
+        db.query(NametoUID.id, NametoUID.name).filter(NametoUID.id.in_(user_ids)).all()
+    ) if user_ids else {}
+
+    return {
+        "nodes": [{"id": u, "name": names.get(u)} for u in sorted(user_ids)],
+        "edges": [
+            {
+                "source": r.user_a,
+                "target": r.user_b,
+                "overlap_minutes": round(float(r.overlap_seconds) / 60, 2),
+                "last_seen": str(r.last_seen),
+            }
+            for r in edges
+        ],
+    }
+
+
 # -----------------------------
 # LIST OF ALL USERS
 # -----------------------------
@@ -1,43 +1,44 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from backend.database_engine import engine, RealtimeLocationData
-from datetime import datetime, timedelta
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database_engine import get_async_db, RealtimeLocationData
+from backend.services.live_positions import live_positions
+from datetime import datetime, timedelta, timezone
 
-router = APIRouter(prefix="/locations", tags=["locations"])
-
-# -----------------------------
-# DB SESSION DEPENDENCY
-# -----------------------------
-def get_db():
-    db = Session(bind=engine)
-    try:
-        yield db
-    finally:
-        db.close()
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT_SEC = 15
 
+router = APIRouter(prefix="/locations", tags=["locations"])
 
 # -----------------------------
 # GET RECENT LOCATIONS (LAST MIN)
 # -----------------------------
 @router.get("/")
-def get_recent_locations(db: Session = Depends(get_db)):
+async def get_recent_locations(db: AsyncSession = Depends(get_async_db)):
     """Return recent location samples (past minute)."""
 
-    since = datetime.utcnow() - timedelta(minutes=1)
+    # Served from the live position cache while its listener is connected
+    if live_positions.connected:
+        return live_positions.recent(seconds=60, limit=1000)
+
+    since = datetime.now(timezone.utc) - timedelta(minutes=1)
 
     query = (
-        db.query(
+        select(
             RealtimeLocationData.id,
             RealtimeLocationData.recorded_at,
             RealtimeLocationData.x_coordinate,
             RealtimeLocationData.y_coordinate
         )
-        .filter(RealtimeLocationData.recorded_at >= since)
+        .where(RealtimeLocationData.recorded_at >= since)
         .order_by(RealtimeLocationData.recorded_at.desc())
         .limit(1000)
     )
 
-    results = query.all()
+    results = (await db.execute(query)).all()
 
     return [
         {
@@ -48,3 +49,50 @@ def get_recent_locations(db: Session = Depends(get_db)):
         }
         for r in results
     ]
+
+
+# -----------------------------
+# LATEST POSITION PER TAG (CACHE)
+# -----------------------------
+@router.get("/latest")
+def get_latest_locations():
+    """Latest known position of every tag, from memory (no DB query)."""
+    return {
+        "live": live_positions.connected,
+        "positions": list(live_positions.latest().values()),
+    }
+
+
+# -----------------------------
+# LIVE POSITION STREAM (SSE)
+# -----------------------------
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/stream")
+async def stream_locations(request: Request):
+    """
+    Server-Sent Events: one "snapshot" with every tag's latest position,
+    then "delta" events with only the tags that moved.
+    """
+    queue = live_positions.subscribe()
+
+    async def events():
+        try:
+            yield _sse("snapshot", list(live_positions.latest().values()))
+            while not await request.is_disconnected():
+                try:
+                    delta = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse("delta", list(delta.values()))
+        finally:
+            live_positions.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,92 +1,143 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from sqlalchemy import text
 
 from backend.database_engine import (
-    engine, 
-    UserEventSessions, 
-    Events, 
-    RealtimeLocationData, 
-    NametoUID
+    get_db,
+    get_async_sessionmaker,
+    NametoUID,
+    UserDailyInteraction
 )
 from sqlalchemy import func
+from backend.services.report_cache import report_cache
+from backend.services.copresence import top_friends
+from backend.services.mobility import MOBILITY_BUCKET, MOBILITY_MAX_POINTS, mobility_summary
 
 router = APIRouter(tags=["reports"])
 
-def get_db():
-    db = Session(bind=engine)
-    try:
-        yield db
-    finally:
-        db.close()
+async def _run_report_part(fn, *args):
+    # Each part gets its own async session/connection so the parts run concurrently
+    async with get_async_sessionmaker()() as db:
+        return await db.run_sync(fn, *args)
 
 @router.get("/{user_id}")
-def full_report(user_id: int, db: Session = Depends(get_db)):
-    return {
+async def full_report(user_id: int):
+    # Cached per user; event detection invalidates users whose sessions changed
+    cached = report_cache.get(user_id)
+    if cached is not None:
+        return cached
+    generation = report_cache.generation(user_id)
+
+    # Independent sub-queries run at the same time on the async engine
+    summary, events, mobility, friends = await asyncio.gather(
+        _run_report_part(report_summary, user_id),
+        _run_report_part(event_report, user_id),
+        _run_report_part(mobility_report, user_id),
+        _run_report_part(friend_report, user_id),
+    )
+
+    report = {
         "user_id": user_id,
-        "name": get_user_name(db, user_id),
-        "socialization": socialization_report(db, user_id),
-        "events": event_report(db, user_id),
-        "mobility": mobility_report(db, user_id),
-        "butterfly": butterfly_report(db, user_id),
-        "friends": friend_report(db, user_id)
+        "name": summary["name"],
+        "socialization": socialization_report(None, user_id, summary),
+        "events": events,
+        "mobility": mobility,
+        "butterfly": butterfly_report(None, user_id, summary),
+        "friends": friends
     }
 
-def get_user_name(db, user_id):
-    user = db.query(NametoUID).filter(NametoUID.id == user_id).first()
-    return user.name if user else "Unknown User"
-
-def socialization_report(db, user_id):
-    now = datetime.now()
-
-    def duration_since(dt):
-        return (
-            db.query(
-                func.sum(
-                    func.extract("epoch", UserEventSessions.end_time - UserEventSessions.start_time)
-                )
-            )
-            .filter(
-                UserEventSessions.id == user_id,
-                UserEventSessions.end_time >= dt
-            )
-            .scalar() or 0
-        ) / 3600  # return hours
+    # Not cached if detection invalidated this user while it was computed
+    report_cache.set(user_id, report, generation)
+    return report
+
+def report_summary(db, user_id):
+    """Name plus every interaction total the report needs, in one query on the daily rollup."""
+    today = datetime.now().date()
+    since = {
+        "today": today,
+        "week": today - timedelta(days=6),
+        "month": today - timedelta(days=29),
+    }
+
+    seconds = UserDailyInteraction.interaction_seconds
+    name = (
+        db.query(NametoUID.name)
+        .filter(NametoUID.id == user_id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    row = (
+        db.query(
+            name.label("name"),
+            *[
+                func.coalesce(func.sum(seconds).filter(UserDailyInteraction.day >= day), 0).label(key)
+                for key, day in since.items()
+            ],
+            func.coalesce(func.sum(seconds), 0).label("total"),
+        )
+        .filter(UserDailyInteraction.user_id == user_id)
+        .one()
+    )
+
+    return {
+        "name": row.name or "Unknown User",
+        "today_seconds": float(row.today),
+        "week_seconds": float(row.week),
+        "month_seconds": float(row.month),
+        "total_seconds": float(row.total),
+    }
+
+def socialization_report(db, user_id, summary=None):
+    summary = summary or report_summary(db, user_id)
 
     return {
-        "today_hours": round(duration_since(now.replace(hour=0, minute=0, second=0, microsecond=0)), 2),
-        "week_hours": round(duration_since(now - timedelta(days=7)), 2),
-        "month_hours": round(duration_since(now - timedelta(days=30)), 2)
+        "today_hours": round(summary["today_seconds"] / 3600, 2),
+        "week_hours": round(summary["week_seconds"] / 3600, 2),
+        "month_hours": round(summary["month_seconds"] / 3600, 2)
     }
 
-def event_report(db, user_id):
-    sql = """
-        SELECT 
-            e.event_id,
-            e.start_time,
-            e.end_time,
-            (
-                SELECT COUNT(DISTINCT id)
-                FROM user_event_sessions
-                WHERE event_id = e.event_id
-            ) AS participants
-        FROM user_event_sessions ue
-        JOIN events e ON ue.event_id = e.event_id
-        WHERE ue.id = :uid
-        ORDER BY e.start_time DESC;
-    """
-  
-    rows = db.execute(text(sql), {"uid": user_id}).fetchall()
-
-    # Remove duplicates by event_id
-    events_map = {}
-    for r in rows:
-        events_map[r.event_id] = r
-
-    unique_rows = list(events_map.values())
-
-    # Format output just like before
+EVENT_PAGE_SIZE = 50
+
+# One page of the user's events, keyset-paginated on (start_time, event_id).
+# Without an id the cursor falls between timestamps: the COALESCE defaults
+# sort before / after every real event_id.
+EVENT_PAGE_SQL = """
+    SELECT e.event_id, e.start_time, e.end_time, COALESCE(e.participant_count, 0) AS participants
+    FROM events e
+    WHERE EXISTS (
+            SELECT 1 FROM user_event_sessions ue
+            WHERE ue.event_id = e.event_id AND ue.id = :uid
+        )
+      AND (CAST(:before AS timestamp) IS NULL
+           OR (e.start_time, e.event_id) < (:before, COALESCE(CAST(:before_id AS bigint), 0)))
+      AND (CAST(:after AS timestamp) IS NULL
+           OR (e.start_time, e.event_id) > (:after, COALESCE(CAST(:after_id AS bigint), 9223372036854775807)))
+    ORDER BY e.start_time {order}, e.event_id {order}
+    LIMIT :limit;
+"""
+
+def event_report(db, user_id, before=None, after=None, limit=EVENT_PAGE_SIZE, before_id=None, after_id=None):
+    # Paging forward (after) walks oldest-first; results are always newest-first
+    order = "ASC" if after is not None and before is None else "DESC"
+    rows = db.execute(
+        text(EVENT_PAGE_SQL.format(order=order)),
+        {
+            "uid": user_id,
+            "before": before,
+            "before_id": before_id,
+            "after": after,
+            "after_id": after_id,
+            "limit": limit,
+        },
+    ).fetchall()
+
+    if order == "ASC":
+        rows = rows[::-1]
+
     return [
         {
             "event_id": r.event_id,
@@ -94,53 +145,55 @@ def event_report(db, user_id):
             "end": str(r.end_time),
             "participants": r.participants
         }
-        for r in unique_rows
+        for r in rows
     ]
 
-def mobility_report(db, user_id):
-    rows = (
-        db.query(
-            RealtimeLocationData.x_coordinate,
-            RealtimeLocationData.y_coordinate,
-            RealtimeLocationData.recorded_at
-        )
-        .filter(RealtimeLocationData.id == user_id)
-        .order_by(RealtimeLocationData.recorded_at)
-        .all()
-    )
 
-    points = [
-        {"x": r.x_coordinate, "y": r.y_coordinate, "timestamp": str(r.recorded_at)}
-        for r in rows
-    ]
+@router.get("/{user_id}/events")
+def events_route(
+    user_id: int,
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    after: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(EVENT_PAGE_SIZE, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    events = event_report(db, user_id, before, after, limit, before_id, after_id)
+    return {
+        "events": events,
+        # Pass back as `before` + `before_id` / `after` + `after_id` to get
+        # the older / newer page
+        "next_before": events[-1]["start"] if events else None,
+        "next_before_id": events[-1]["event_id"] if events else None,
+        "prev_after": events[0]["start"] if events else None,
+        "prev_after_id": events[0]["event_id"] if events else None,
+    }
 
-    # -------- GRID BUCKET SIZE --------
-    BUCKET = 20  # group into 20x20 unit squares
 
-    heatmap = {}
-    for p in points:
-        bx = round(p['x'] / BUCKET) * BUCKET
-        by = round(p['y'] / BUCKET) * BUCKET
-        key = f"{bx},{by}"
-        heatmap[key] = heatmap.get(key, 0) + 1
+def mobility_report(db, user_id, start=None, end=None, bucket=MOBILITY_BUCKET,
+                    max_points=MOBILITY_MAX_POINTS, path_method="dp"):
+    # Heatmap binned and path decimated in SQL, so the size stays bounded;
+    # no start means the last MOBILITY_DEFAULT_DAYS
+    return mobility_summary(db, user_id, start, end, bucket, max_points, path_method)
 
-    zones = list(heatmap.keys())
 
-    return {
-        "zones_visited": zones,
-        "heatmap": heatmap,   # <----- NEW
-        "movement_path": points
-    }
+@router.get("/{user_id}/mobility")
+def mobility_route(
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: int = Query(MOBILITY_BUCKET, ge=1),
+    max_points: int = Query(MOBILITY_MAX_POINTS, ge=2, le=10_000),
+    path_method: str = Query("dp", pattern="^(dp|time)$"),
+    db: Session = Depends(get_db),
+):
+    return mobility_report(db, user_id, start, end, bucket, max_points, path_method)
 
 
-def butterfly_report(db, user_id):
-    total_minutes = (
-        db.query(func.sum(
-            func.extract("epoch", UserEventSessions.end_time - UserEventSessions.start_time)
-        ))
-        .filter(UserEventSessions.id == user_id)
-        .scalar() or 0
-    ) / 60
+def butterfly_report(db, user_id, summary=None):
+    summary = summary or report_summary(db, user_id)
+    total_minutes = summary["total_seconds"] / 60
 
     status = "Isolated" if total_minutes < 30 else "Moderate" if total_minutes < 120 else "Social"
 
@@ -149,28 +202,20 @@ def butterfly_report(db, user_id):
         "isolation_level": status
     }
 
-def friend_report(db, user_id):
-    sql = """
-        SELECT 
-            CASE WHEN ue.id = :uid THEN u2.id ELSE ue.id END AS other_user,
-            SUM(EXTRACT(EPOCH FROM (LEAST(ue.end_time, u2.end_time) - GREATEST(ue.start_time, u2.start_time)))) AS overlap
-        FROM user_event_sessions ue
-        JOIN user_event_sessions u2 ON ue.event_id = u2.event_id
-        WHERE ue.id = :uid AND u2.id != :uid
-        GROUP BY other_user
-        ORDER BY overlap DESC
-        LIMIT 3;
-    """
-
-    rows = db.execute(text(sql), {"uid": user_id}).fetchall()
-    results = []
-
-    for r in rows:
-        name = db.query(NametoUID.name).filter(NametoUID.id == r.other_user).scalar()
-        results.append({
+def friend_report(db, user_id, k=3):
+    # Top-k read on the co-presence index (names joined in the same query)
+    rows = top_friends(db, user_id, k)
+
+    return [
+        {
             "user_id": r.other_user,
-            "name": name,
-            "overlap_minutes": round((r.overlap or 0) / 60, 2)
-        })
+            "name": r.name,
+            "overlap_minutes": round(float(r.overlap_seconds or 0) / 60, 2)
+        }
+        for r in rows
+    ]
+
 
-    return results
+@router.get("/{user_id}/friends")
+def friends_route(user_id: int, k: int = Query(3, ge=1, le=100), db: Session = Depends(get_db)):
+    return friend_report(db, user_id, k)
@@ -1,6 +1,20 @@
+import os
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.api import routes_events, routes_location, event_detection, routes_reports
+from backend.database_engine import get_engine, init_db
+from backend.services.live_positions import live_positions
+from backend.services.live_events import live_events
+from backend.services.overview import overview_snapshot
+from backend.services.partition_maintenance import run_maintenance
+
+# Partition pre-creation/retention also runs once in init_db at startup
+PARTITION_MAINTENANCE_INTERVAL_SEC = 6 * 3600
+
+# Set INIT_DB_ON_STARTUP=0 when migrations run as a separate step
+# (python -m backend.database_engine), so worker restarts skip them
+INIT_DB_ON_STARTUP = os.getenv("INIT_DB_ON_STARTUP", "1") == "1"
 
 app = FastAPI()
 
@@ -11,6 +25,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],   # read by the dashboard for /overview revalidation
 )
 
 # --- Include backend routes ---
@@ -19,6 +34,68 @@ app.include_router(routes_location.router, prefix="/api/routes_location", tags=[
 app.include_router(event_detection.router, prefix="/api/event_detection", tags=["event_detection"])
 app.include_router(routes_reports.router, prefix="/api/routes_reports", tags=["reports"])
 
+# --- Schema setup (not done at import) ---
+@app.on_event("startup")
+def initialize_database():
+    if INIT_DB_ON_STARTUP:
+        init_db()
+
+
+# --- Live position cache (LISTEN/NOTIFY fed by ingestion) ---
+@app.on_event("startup")
+def start_live_positions():
+    live_positions.start(get_engine().url.translate_connect_args(username="user", database="dbname"))
+
+
+@app.on_event("shutdown")
+def stop_live_positions():
+    live_positions.stop()
+
+
+# --- Live events (streaming detector transitions from ingestion) ---
+@app.on_event("startup")
+def start_live_events():
+    live_events.start(get_engine().url.translate_connect_args(username="user", database="dbname"))
+
+
+@app.on_event("shutdown")
+def stop_live_events():
+    live_events.stop()
+
+
+# --- Dashboard overview snapshot (refreshed in the background) ---
+@app.on_event("startup")
+def start_overview_snapshot():
+    overview_snapshot.start()
+
+
+@app.on_event("shutdown")
+def stop_overview_snapshot():
+    overview_snapshot.stop()
+
+
+# --- Partition maintenance for realtime_location_data ---
+_stop_maintenance = threading.Event()
+
+
+def _partition_maintenance_loop():
+    while not _stop_maintenance.wait(PARTITION_MAINTENANCE_INTERVAL_SEC):
+        try:
+            run_maintenance(get_engine())
+        except Exception as e:
+            print(f"Partition maintenance failed: {e}")
+
+
+@app.on_event("startup")
+def start_partition_maintenance():
+    threading.Thread(target=_partition_maintenance_loop, name="partition-maintenance", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_partition_maintenance():
+    _stop_maintenance.set()
+
+
 @app.get("/")
 def root():
     return {"message": "SilverSync backend running"}
@@ -1,19 +1,69 @@
 import json
-import psycopg2
+import signal
+import threading
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
+from backend.services.ingestion_queue import IngestionQueue, LocationWriterPool
+from backend.services.downsampler import TagDownsampler
+from backend.services.streaming_detection import StreamingEventDetector, StreamingDetectionWorker
+from backend.database_engine import get_engine, init_db
+
 # --------------------------------------------------------------------
 # PostgreSQL Connection
+# Raw psycopg2 connections checked out of the shared engine pool (same
+# size/pre-ping/recycle/timeout settings as the API); close() returns
+# them to the pool. Each writer thread holds one while it runs.
+# --------------------------------------------------------------------
+def connect_db():
+    return get_engine().raw_connection()
+
+# --------------------------------------------------------------------
+# CONFIG: Write batching
+# A flush happens at FLUSH_MAX_ROWS samples or after FLUSH_MAX_LATENCY_MS,
+# whichever comes first. At most MAX_BUFFERED_ROWS are held in memory.
+# --------------------------------------------------------------------
+FLUSH_MAX_ROWS = 500
+FLUSH_MAX_LATENCY_MS = 250
+MAX_BUFFERED_ROWS = 50_000
+
+# --------------------------------------------------------------------
+# CONFIG: Receive/write decoupling
+# on_message only parses and enqueues; WRITER_THREADS drain the queue.
+# QUEUE_POLICY decides what happens when QUEUE_MAX_SAMPLES is reached:
+#   "block" (wait up to QUEUE_BLOCK_TIMEOUT_SEC), "drop_oldest" or
+#   "spill" (append to SPILL_PATH and replay once the queue has room)
 # --------------------------------------------------------------------
-conn = psycopg2.connect(
-    host = "192.168.137.2",
-    port = 5432,
-    dbname="demoDB",
-    user="postgres",
-    password="WAKE419!"
-)
-cursor = conn.cursor()
+QUEUE_MAX_SAMPLES = 20_000
+QUEUE_POLICY = "drop_oldest"
+QUEUE_BLOCK_TIMEOUT_SEC = 0.5
+SPILL_PATH = "ingestion_spill.jsonl"
+WRITER_THREADS = 2
+STATS_LOG_INTERVAL_SEC = 30
+
+# --------------------------------------------------------------------
+# CONFIG: Per-tag downsampling
+# Tags can publish every 20 ms; event detection works on 1 s buckets.
+# Forward at most one DOWNSAMPLE_METHOD ("mean"/"median") sample per tag
+# per DOWNSAMPLE_INTERVAL_SEC, plus any sample that moved more than
+# DOWNSAMPLE_MOVE_THRESHOLD from the last forwarded one (None = off).
+# --------------------------------------------------------------------
+DOWNSAMPLE_ENABLED = True
+DOWNSAMPLE_INTERVAL_SEC = 1.0
+DOWNSAMPLE_METHOD = "mean"
+DOWNSAMPLE_MOVE_THRESHOLD = None
+
+# --------------------------------------------------------------------
+# CONFIG: Streaming event detection
+# Forwarded samples also go to a detector thread that closes each 1 s
+# bucket STREAM_LATENESS_SEC after it ends, writes events as they close
+# and NOTIFYs open/extend/close transitions for the API's live events.
+# Its queue drops the oldest samples when full so it never slows writes.
+# --------------------------------------------------------------------
+STREAMING_DETECTION_ENABLED = True
+STREAM_QUEUE_MAX_SAMPLES = 20_000
+STREAM_LATENESS_SEC = 3.0
+STREAM_TICK_SEC = 0.5
 
 # --------------------------------------------------------------------
 # CONFIG: Map BLE Tag Names → User IDs
@@ -29,11 +79,12 @@ TAG_ID_MAP = {
     # Add more mappings as needed
 }
 
-def sync_tag_map_to_database(tag_map):
+def sync_tag_map_to_database(conn, tag_map):
     """
     Syncs hard-coded TAG_ID_MAP into the nametouid table.
     Adds new entries or updates names as needed.
     """
+    cursor = conn.cursor()
 
     for tag_id, user in tag_map.items():
         user_id = user["id"]
@@ -53,7 +104,8 @@ def sync_tag_map_to_database(tag_map):
 # --------------------------------------------------------------------
 # Parse MQTT Messages
 # --------------------------------------------------------------------
-def on_message(client, userdata, msg):
+def parse_position_message(msg):
+    """Return (user_id, x, y, recorded_at) for a position message, or None."""
 
     # Example topic:
     # silabs/aoa/position/positioning-test_room/ble-pd-6C5CB1CCD310
@@ -62,7 +114,7 @@ def on_message(client, userdata, msg):
 
     if tag_name not in TAG_ID_MAP:
         print(f"Unknown tag: {tag_name} (add to TAG_ID_MAP)")
-        return
+        return None
 
     user_id = TAG_ID_MAP[tag_name]["id"]
 
@@ -75,29 +127,121 @@ def on_message(client, userdata, msg):
     # Use server-side timestamp
     recorded_at = datetime.utcnow()
 
-    # Insert into database
-    cursor.execute("""
-        INSERT INTO realtime_location_data (id, x_coordinate, y_coordinate, recorded_at)
-        VALUES (%s, %s, %s, %s)
-    """, (user_id, x, y, recorded_at))
+    return user_id, x, y, recorded_at
 
-    conn.commit()
 
-    print(f"Inserted: user={id} x={x} y={y} time={recorded_at} tag={tag_name}")
+def forward(queues, samples):
+    # Every queue (writers, streaming detector) gets every forwarded sample
+    for s in samples:
+        for queue in queues:
+            queue.put(s)
 
 
-# --------------------------------------------------------------------
-# MQTT Setup
-# --------------------------------------------------------------------
-client = mqtt.Client()
-sync_tag_map_to_database(TAG_ID_MAP)
-client.on_message = on_message
+def on_message(client, userdata, msg):
+    # userdata holds the queues and optional downsampler (see main); never touch the DB here
+    sample = parse_position_message(msg)
+    if sample is None:
+        return
+
+    downsampler = userdata.get("downsampler")
+    forward(userdata["queues"], downsampler.add(*sample) if downsampler else [sample])
 
-# IP from your screenshot is likely 192.168.137.1
-client.connect("192.168.137.1", 1883, 60)
 
-# Subscribe to all BLE position topics
-# From screenshot: silabs / aoa / position / positioning-test_room / <tag>
-client.subscribe("silabs/aoa/position/#")
+def flush_quiet_tags(downsampler, queues, stop):
+    # Tags that stop publishing would otherwise keep their last window forever
+    while not stop.wait(DOWNSAMPLE_INTERVAL_SEC):
+        forward(queues, downsampler.flush_expired())
 
-client.loop_forever()
+
+def log_stats(queue, pool, downsampler, detection, stop):
+    while not stop.wait(STATS_LOG_INTERVAL_SEC):
+        print(f"Ingestion queue: {queue.stats()} writers: {pool.stats()}")
+        if downsampler:
+            print(f"Downsampler: {downsampler.stats()}")
+        if detection:
+            print(f"Streaming detection: {detection.stats()}")
+
+
+# --------------------------------------------------------------------
+# MQTT Setup
+# --------------------------------------------------------------------
+def main():
+    init_db()
+
+    conn = connect_db()
+    sync_tag_map_to_database(conn, TAG_ID_MAP)
+    conn.close()
+
+    queue = IngestionQueue(
+        maxsize=QUEUE_MAX_SAMPLES,
+        policy=QUEUE_POLICY,
+        block_timeout=QUEUE_BLOCK_TIMEOUT_SEC,
+        spill_path=SPILL_PATH,
+    )
+    pool = LocationWriterPool(
+        queue,
+        connect_db,
+        workers=WRITER_THREADS,
+        max_rows=FLUSH_MAX_ROWS,
+        max_latency_ms=FLUSH_MAX_LATENCY_MS,
+        max_buffered_rows=MAX_BUFFERED_ROWS,
+    )
+    pool.start()
+    queues = [queue]
+
+    detection = None
+    if STREAMING_DETECTION_ENABLED:
+        stream_queue = IngestionQueue(maxsize=STREAM_QUEUE_MAX_SAMPLES, policy="drop_oldest")
+        detection = StreamingDetectionWorker(
+            stream_queue,
+            StreamingEventDetector(bucket_sec=DOWNSAMPLE_INTERVAL_SEC, lateness_sec=STREAM_LATENESS_SEC),
+            tick_sec=STREAM_TICK_SEC,
+        )
+        detection.start()
+        queues.append(stream_queue)
+
+    downsampler = None
+    if DOWNSAMPLE_ENABLED:
+        downsampler = TagDownsampler(
+            interval_sec=DOWNSAMPLE_INTERVAL_SEC,
+            method=DOWNSAMPLE_METHOD,
+            move_threshold=DOWNSAMPLE_MOVE_THRESHOLD,
+        )
+
+    stop_background = threading.Event()
+    threading.Thread(target=log_stats, args=(queue, pool, downsampler, detection, stop_background), daemon=True).start()
+    if downsampler:
+        threading.Thread(target=flush_quiet_tags, args=(downsampler, queues, stop_background), daemon=True).start()
+
+    client = mqtt.Client(userdata={"queues": queues, "downsampler": downsampler})
+    client.on_message = on_message
+
+    # Stop cleanly on SIGTERM as well as Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: client.disconnect())
+
+    # IP from your screenshot is likely 192.168.137.1
+    client.connect("192.168.137.1", 1883, 60)
+
+    # Subscribe to all BLE position topics
+    # From screenshot: silabs / aoa / position / positioning-test_room / <tag>
+    client.subscribe("silabs/aoa/position/#")
+
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        client.disconnect()
+    finally:
+        # Drain the queue and flush every writer before exiting
+        stop_background.set()
+        if downsampler:
+            forward(queues, downsampler.flush_all())
+        pool.stop()
+        print(f"Ingestion stopped: {queue.stats()} writers: {pool.stats()}")
+        if detection:
+            # After the writers, so the closing events' samples are stored
+            detection.stop()
+            print(f"Streaming detection stopped: {detection.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+copresence.py
+
+Pairwise co-presence index (user_copresence).
+
+friend_report used to self-join user_event_sessions on event_id for every
+request. Event detection now adds the overlap of every participant pair of
+each new event to user_copresence in the same transaction, so a user's
+closest friends are a top-k read on (user_a, overlap_seconds) and the
+facility-wide social graph is a scan of one row per pair.
+
+Rebuild from scratch:
+
+    python -m backend.services.copresence --rebuild
+"""
+
+import argparse
+
+from sqlalchemy import text
+
+# Overlap per ordered (user_a, user_b) pair for the selected events
+_PAIRS_SQL = """
+    SELECT
+        a.id AS user_a,
+        b.id AS user_b,
+        SUM(EXTRACT(EPOCH FROM LEAST(a.end_time, b.end_time) - GREATEST(a.start_time, b.start_time))) AS overlap,
+        MAX(LEAST(a.end_time, b.end_time)) AS last_seen
+    FROM user_event_sessions a
+    JOIN user_event_sessions b
+      ON a.event_id = b.event_id AND a.id != b.id
+     -- Sessions carry each user's own join/leave times; only overlaps count
+     AND a.start_time < b.end_time AND b.start_time < a.end_time
+    {where}
+    GROUP BY a.id, b.id
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO user_copresence (user_a, user_b, overlap_seconds, last_seen)
+    {select}
+    ON CONFLICT (user_a, user_b) DO UPDATE SET
+        overlap_seconds = user_copresence.overlap_seconds + EXCLUDED.overlap_seconds,
+        last_seen = GREATEST(user_copresence.last_seen, EXCLUDED.last_seen)
+"""
+
+ADD_EVENTS_SQL = text(_UPSERT_SQL.format(
+    select=_PAIRS_SQL.format(where="WHERE a.event_id = ANY(CAST(:event_ids AS integer[]))")
+))
+REBUILD_SQL = text(_UPSERT_SQL.format(select=_PAIRS_SQL.format(where="")))
+
+TOP_FRIENDS_SQL = text("""
+    SELECT c.user_b AS other_user, n.name, c.overlap_seconds, c.last_seen
+    FROM user_copresence c
+    LEFT JOIN nametouid n ON n.id = c.user_b
+    WHERE c.user_a = :uid
+    ORDER BY c.overlap_seconds DESC
+    LIMIT :k
+""")
+
+# Each undirected pair once (user_a < user_b)
+GRAPH_SQL = text("""
+    SELECT user_a, user_b, overlap_seconds, last_seen
+    FROM user_copresence
+    WHERE user_a < user_b AND overlap_seconds >= :min_seconds
+    ORDER BY overlap_seconds DESC
+    LIMIT :limit
+""")
+
+
+def add_events(session, event_ids):
+    """Add the participant pairs of newly written events; call in the transaction that wrote them."""
+    if event_ids:
+        session.execute(ADD_EVENTS_SQL, {"event_ids": [int(e) for e in event_ids]})
+
+
+def rebuild(conn):
+    conn.execute(text("TRUNCATE user_copresence"))
+    conn.execute(REBUILD_SQL)
+
+
+def backfill_if_empty(conn):
+    empty = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM user_copresence)")).scalar()
+    if empty:
+        conn.execute(REBUILD_SQL)
+
+
+def top_friends(db, user_id, k=3):
+    return db.execute(TOP_FRIENDS_SQL, {"uid": user_id, "k": k}).fetchall()
+
+
+def social_graph(db, min_seconds=0, limit=5000):
+    return db.execute(GRAPH_SQL, {"min_seconds": min_seconds, "limit": limit}).fetchall()
+
+
+def main():
+    from backend.database_engine import get_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the user_copresence index.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every pair from user_event_sessions")
+    args = parser.parse_args()
+
+    with get_engine().begin() as conn:
+        if args.rebuild:
+            rebuild(conn)
+        else:
+            backfill_if_empty(conn)
+        rows = conn.execute(text("SELECT count(*) FROM user_copresence")).scalar()
+    print(f"user_copresence rows: {rows}")
+
+
+if __name__ == "__main__":
+    main()
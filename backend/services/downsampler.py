@@ -0,0 +1,153 @@
+"""
+downsampler.py
+
+Ingestion-side reducer for position samples.
+
+The locator pipeline can publish a position per tag every 20 ms, while event
+detection only looks at one-second buckets. TagDownsampler keeps a small
+window per tag, aligned to the same epoch buckets event detection uses, and
+emits one averaged (or median-filtered) sample per window. Optionally, a
+sample that moved more than `move_threshold` from the last emitted position
+is passed through immediately so fast movement is not smoothed away.
+"""
+
+import statistics
+import threading
+from datetime import datetime
+
+DOWNSAMPLE_METHODS = ("mean", "median")
+
+
+class _Window:
+    __slots__ = ("bucket", "count", "sum_x", "sum_y", "xs", "ys", "last_at")
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.count = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.xs = []
+        self.ys = []
+        self.last_at = None
+
+
+class TagDownsampler:
+    """
+    add() returns the samples to forward (usually none, sometimes one or
+    two); memory is one window per tag, capped at `max_window_samples`
+    points for the median method.
+    """
+
+    def __init__(self, interval_sec=1.0, method="mean", move_threshold=None, max_window_samples=256):
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Unknown downsample method: {method}")
+
+        self.interval_sec = interval_sec
+        self.method = method
+        self.move_threshold = move_threshold
+        self.max_window_samples = max_window_samples
+
+        self._windows = {}       # user_id -> _Window
+        self._last_emitted = {}  # user_id -> (x, y)
+        self._lock = threading.Lock()
+
+        self.samples_in = 0
+        self.samples_out = 0
+
+    def _bucket(self, recorded_at):
+        # Same bucketing as event detection: floor(epoch / interval).
+        # Ingestion timestamps are naive UTC.
+        epoch = (recorded_at - datetime(1970, 1, 1, tzinfo=recorded_at.tzinfo)).total_seconds()
+        return int(epoch // self.interval_sec)
+
+    # -----------------------------
+    # Input
+    # -----------------------------
+    def add(self, user_id, x, y, recorded_at):
+        out = []
+        bucket = self._bucket(recorded_at)
+
+        with self._lock:
+            self.samples_in += 1
+            window = self._windows.get(user_id)
+
+            if window is not None and window.bucket != bucket:
+                out.extend(self._close(user_id, window))
+                window = None
+
+            if self._moved(user_id, x, y):
+                # Large jump: forward as-is, after anything accumulated before it
+                if window is not None:
+                    out.extend(self._close(user_id, window))
+                self._windows.pop(user_id, None)
+                self._last_emitted[user_id] = (x, y)
+                out.append((user_id, x, y, recorded_at))
+                self.samples_out += 1
+                return out
+
+            if window is None:
+                window = self._windows[user_id] = _Window(bucket)
+
+            window.count += 1
+            window.sum_x += x
+            window.sum_y += y
+            window.last_at = recorded_at
+            if self.method == "median":
+                window.xs.append(x)
+                window.ys.append(y)
+                if len(window.xs) > self.max_window_samples:
+                    del window.xs[0], window.ys[0]
+
+        return out
+
+    def _moved(self, user_id, x, y):
+        if self.move_threshold is None or user_id not in self._last_emitted:
+            return False
+        lx, ly = self._last_emitted[user_id]
+        return ((x - lx) ** 2 + (y - ly) ** 2) ** 0.5 > self.move_threshold
+
+    def _close(self, user_id, window):
+        # Caller holds self._lock
+        if window.count == 0:
+            return []
+        if self.method == "median":
+            x, y = statistics.median(window.xs), statistics.median(window.ys)
+        else:
+            x, y = window.sum_x / window.count, window.sum_y / window.count
+
+        self._last_emitted[user_id] = (x, y)
+        self.samples_out += 1
+        return [(user_id, x, y, window.last_at)]
+
+    # -----------------------------
+    # Time-based output
+    # -----------------------------
+    def flush_expired(self, now=None):
+        """Close windows whose bucket ended before `now` (naive UTC), for tags that went quiet."""
+        now = now or datetime.utcnow()
+        current = self._bucket(now)
+        out = []
+
+        with self._lock:
+            for user_id, window in list(self._windows.items()):
+                if window.bucket < current:
+                    out.extend(self._close(user_id, window))
+                    del self._windows[user_id]
+        return out
+
+    def flush_all(self):
+        out = []
+        with self._lock:
+            for user_id, window in list(self._windows.items()):
+                out.extend(self._close(user_id, window))
+            self._windows.clear()
+        return out
+
+    def stats(self):
+        with self._lock:
+            return {
+                "samples_in": self.samples_in,
+                "samples_out": self.samples_out,
+                "reduction": round(self.samples_in / self.samples_out, 1) if self.samples_out else 0.0,
+                "open_windows": len(self._windows),
+            }
@@ -0,0 +1,277 @@
+"""
+ingestion_queue.py
+
+Producer/consumer pipeline between the MQTT network thread and Postgres.
+
+The MQTT callback only parses and puts samples on a bounded IngestionQueue;
+LocationWriterPool threads drain it into BufferedLocationWriters. A slow or
+unreachable database therefore never blocks the MQTT socket, and what
+happens when the queue is full is an explicit policy:
+
+    block        wait for room (up to block_timeout, then drop)
+    drop_oldest  discard the oldest queued sample
+    spill        append the sample to a JSON-lines file, replayed later
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from backend.services.location_writer import BufferedLocationWriter
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "spill")
+
+
+class IngestionQueue:
+
+    def __init__(self, maxsize=10_000, policy="block", block_timeout=None, spill_path=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        if policy == "spill" and not spill_path:
+            raise ValueError("spill policy needs a spill_path")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.spill_path = spill_path
+
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._spill_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+
+        # Counters
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.max_depth = 0
+        self.enqueue_seconds_total = 0.0
+        self.enqueue_seconds_max = 0.0
+
+    # -----------------------------
+    # Producer side
+    # -----------------------------
+    def put(self, sample):
+        start = time.perf_counter()
+        spill = False
+
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.policy == "block":
+                    if not self._not_full.wait_for(
+                        lambda: len(self._items) < self.maxsize, self.block_timeout
+                    ):
+                        self.dropped += 1
+                        self._record_latency(start)
+                        return False
+                elif self.policy == "drop_oldest":
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    spill = True
+                    self.spilled += 1
+
+            if not spill:
+                self._items.append(sample)
+                self.enqueued += 1
+                self.max_depth = max(self.max_depth, len(self._items))
+                self._not_empty.notify()
+            self._record_latency(start)
+
+        if spill:
+            # File I/O happens outside the queue lock
+            self._spill([sample])
+        return True
+
+    def _record_latency(self, start):
+        # Caller holds self._lock
+        elapsed = time.perf_counter() - start
+        self.enqueue_seconds_total += elapsed
+        self.enqueue_seconds_max = max(self.enqueue_seconds_max, elapsed)
+
+    # -----------------------------
+    # Consumer side
+    # -----------------------------
+    def get_many(self, max_items, timeout):
+        """Up to `max_items` samples; waits at most `timeout` seconds for the first one."""
+        with self._lock:
+            if not self._not_empty.wait_for(lambda: self._items, timeout):
+                return []
+            batch = [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+            self.dequeued += len(batch)
+            self._not_full.notify_all()
+            return batch
+
+    def depth(self):
+        with self._lock:
+            return len(self._items)
+
+    # -----------------------------
+    # Spill to disk
+    # -----------------------------
+    def _spill(self, samples):
+        with self._spill_lock:
+            with open(self.spill_path, "a") as f:
+                for user_id, x, y, recorded_at in samples:
+                    f.write(json.dumps([user_id, x, y, recorded_at.isoformat()]) + "\n")
+
+    def replay_spill(self, chunk=1000):
+        """
+        Move spilled samples back into the queue while there is room. Samples
+        that still do not fit are spilled again. Returns the number replayed.
+        """
+        if self.policy != "spill":
+            return 0
+        replay_path = self.spill_path + ".replay"
+        if not os.path.exists(self.spill_path) and not os.path.exists(replay_path):
+            return 0
+        # Only one worker replays at a time
+        if not self._replay_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._replay_file(chunk)
+        finally:
+            self._replay_lock.release()
+
+    def _replay_file(self, chunk):
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            # A leftover .replay file (interrupted replay) is finished first
+            if not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+
+        replayed = 0
+        with open(replay_path) as f:
+            batch = []
+            for line in f:
+                user_id, x, y, recorded_at = json.loads(line)
+                batch.append((user_id, x, y, datetime.fromisoformat(recorded_at)))
+                if len(batch) >= chunk:
+                    replayed += self._requeue(batch)
+                    batch = []
+            replayed += self._requeue(batch)
+
+        os.remove(replay_path)
+        return replayed
+
+    def _requeue(self, samples):
+        with self._lock:
+            room = max(0, self.maxsize - len(self._items))
+            fits, rest = samples[:room], samples[room:]
+            self._items.extend(fits)
+            self.enqueued += len(fits)
+            self.replayed += len(fits)
+            if fits:
+                self._not_empty.notify_all()
+        if rest:
+            self._spill(rest)
+        return len(fits)
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def stats(self):
+        with self._lock:
+            puts = self.enqueued + self.dropped
+            return {
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "dequeued": self.dequeued,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "replayed": self.replayed,
+                "enqueue_ms_avg": round(self.enqueue_seconds_total / puts * 1000, 4) if puts else 0.0,
+                "enqueue_ms_max": round(self.enqueue_seconds_max * 1000, 4),
+            }
+
+
+class LocationWriterPool:
+    """
+    Writer threads that drain an IngestionQueue, each through its own
+    BufferedLocationWriter (and so its own connection). After a failed flush
+    a worker pauses for `retry_backoff_sec` instead of pulling more samples,
+    so the queue's backpressure policy decides what happens to new data.
+    """
+
+    def __init__(
+        self,
+        queue,
+        connect,
+        workers=1,
+        max_rows=500,
+        max_latency_ms=250,
+        max_buffered_rows=50_000,
+        retry_backoff_sec=1.0,
+        table="realtime_location_data",
+    ):
+        self.queue = queue
+        self.max_rows = max_rows
+        self.max_latency_ms = max_latency_ms
+        self.retry_backoff_sec = retry_backoff_sec
+        self.writers = [
+            BufferedLocationWriter(
+                connect,
+                max_rows=max_rows,
+                max_latency_ms=max_latency_ms,
+                max_buffered_rows=max_buffered_rows,
+                table=table,
+            )
+            for _ in range(workers)
+        ]
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i, writer in enumerate(self.writers):
+            t = threading.Thread(target=self._run, args=(writer,), name=f"location-writer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self, writer):
+        timeout = self.max_latency_ms / 1000
+
+        while True:
+            if writer.last_flush_failed:
+                # Database unavailable: retry what is pending before taking more
+                if self._stop.is_set():
+                    break
+                self._stop.wait(self.retry_backoff_sec)
+                writer.flush()
+                continue
+
+            batch = self.queue.get_many(self.max_rows, timeout)
+            for sample in batch:
+                writer.add(*sample)
+            writer.flush_if_due()
+
+            if not batch:
+                if self._stop.is_set():
+                    break
+                self.queue.replay_spill()
+
+        writer.close()
+
+    def stop(self):
+        """
+        Drain the queue, flush every writer and wait for the threads. If the
+        database is down, workers give up after their pending flush fails.
+        """
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def stats(self):
+        totals = {}
+        for writer in self.writers:
+            for key, value in writer.stats().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
@@ -0,0 +1,85 @@
+"""
+interaction_rollup.py
+
+Per-user, per-day interaction totals (user_daily_interaction).
+
+Socialization, butterfly and low-interaction reports used to re-aggregate
+all of user_event_sessions on every request. Event detection now adds each
+batch of new sessions to this rollup in the same transaction, so the
+reports read a handful of rows per user no matter how much history exists.
+Sessions that cross midnight are split between the days they cover; an
+event is counted on the day it starts.
+
+Rebuild from scratch (e.g. after editing sessions by hand):
+
+    python -m backend.services.interaction_rollup --rebuild
+"""
+
+import argparse
+
+from sqlalchemy import text
+
+# Per (user, day) seconds and event counts for the selected sessions
+_AGGREGATE_SQL = """
+    SELECT
+        s.id AS user_id,
+        d.day::date AS day,
+        SUM(EXTRACT(EPOCH FROM LEAST(s.end_time, d.day + interval '1 day') - GREATEST(s.start_time, d.day))) AS seconds,
+        COUNT(DISTINCT s.event_id) FILTER (WHERE d.day = date_trunc('day', s.start_time)) AS events
+    FROM user_event_sessions s
+    CROSS JOIN LATERAL generate_series(
+        date_trunc('day', s.start_time), date_trunc('day', s.end_time), interval '1 day'
+    ) AS d(day)
+    {where}
+    GROUP BY s.id, d.day
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO user_daily_interaction (user_id, day, interaction_seconds, event_count)
+    {select}
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        interaction_seconds = user_daily_interaction.interaction_seconds + EXCLUDED.interaction_seconds,
+        event_count = user_daily_interaction.event_count + EXCLUDED.event_count
+"""
+
+ADD_EVENTS_SQL = text(_UPSERT_SQL.format(
+    select=_AGGREGATE_SQL.format(where="WHERE s.event_id = ANY(CAST(:event_ids AS integer[]))")
+))
+REBUILD_SQL = text(_UPSERT_SQL.format(select=_AGGREGATE_SQL.format(where="")))
+
+
+def add_events(session, event_ids):
+    """Add the sessions of newly written events; call in the transaction that wrote them."""
+    if event_ids:
+        session.execute(ADD_EVENTS_SQL, {"event_ids": [int(e) for e in event_ids]})
+
+
+def rebuild(conn):
+    conn.execute(text("TRUNCATE user_daily_interaction"))
+    conn.execute(REBUILD_SQL)
+
+
+def backfill_if_empty(conn):
+    empty = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM user_daily_interaction)")).scalar()
+    if empty:
+        conn.execute(REBUILD_SQL)
+
+
+def main():
+    from backend.database_engine import get_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the user_daily_interaction rollup.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every row from user_event_sessions")
+    args = parser.parse_args()
+
+    with get_engine().begin() as conn:
+        if args.rebuild:
+            rebuild(conn)
+        else:
+            backfill_if_empty(conn)
+        rows = conn.execute(text("SELECT count(*) FROM user_daily_interaction")).scalar()
+    print(f"user_daily_interaction rows: {rows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+live_events.py
+
+In-process view of the events the streaming detector has open, fed by
+Postgres LISTEN/NOTIFY.
+
+The ingestion process NOTIFYs LIVE_EVENT_CHANNEL with every open / extend /
+close transition (see streaming_detection). One listener thread per API
+process (see pg_notify) keeps the open events keyed by (detector event_id,
+start time), so the dashboard sees a group within seconds instead of after
+the next detection run. A close arrives in the same transaction that
+writes the event, so an event is always either here or in the events
+table.
+"""
+
+import threading
+from datetime import datetime, timezone
+
+from backend.api.event_detection import DURATION_THRESHOLD_SECONDS, EVENT_GAP_SECONDS
+from backend.services.pg_notify import NotifyListener
+from backend.services.report_cache import report_cache
+from backend.services.streaming_detection import LIVE_EVENT_CHANNEL
+
+# Open events not extended for this long past EVENT_GAP_SECONDS are dropped
+# (e.g. ingestion restarted before closing them)
+STALE_GRACE_SEC = 30
+
+
+def _event(start, end, users):
+    start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    return {
+        "start_time": start.isoformat(),
+        "end_time": end.isoformat(),
+        "duration_seconds": (end - start).total_seconds(),
+        "users": users,
+    }
+
+
+class LiveEventCache:
+
+    def __init__(self, stale_grace_sec=STALE_GRACE_SEC):
+        self.stale_grace_sec = stale_grace_sec
+
+        self._events = {}           # (event_id, start) -> event
+        self._lock = threading.Lock()
+        self._listener = NotifyListener("live-event-listener", self.apply)
+
+        self.updates = 0
+
+    @property
+    def connected(self):
+        return self._listener.connected
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def apply(self, transitions):
+        closed_users = set()
+        with self._lock:
+            for kind, event_id, start, end, users in transitions:
+                key = (event_id, start)
+                if kind == "close":
+                    self._events.pop(key, None)
+                    closed_users.update(users)
+                else:
+                    self._events[key] = _event(start, end, users)
+            self.updates += 1
+
+        # Closed events were just written; these users' reports are stale
+        if closed_users:
+            report_cache.invalidate(closed_users)
+
+    def _prune(self, now):
+        # Caller holds self._lock
+        limit = EVENT_GAP_SECONDS + self.stale_grace_sec
+        for key, event in list(self._events.items()):
+            if (now - datetime.fromisoformat(event["end_time"])).total_seconds() > limit:
+                del self._events[key]
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def active(self, min_duration=DURATION_THRESHOLD_SECONDS):
+        """Open events at least `min_duration` seconds long, oldest first."""
+        with self._lock:
+            self._prune(datetime.now(timezone.utc))
+            events = [e for e in self._events.values() if e["duration_seconds"] >= min_duration]
+        return sorted(events, key=lambda e: e["start_time"])
+
+    # -----------------------------
+    # LISTEN loop
+    # -----------------------------
+    def start(self, connect_kwargs, channel=LIVE_EVENT_CHANNEL):
+        self._listener.start(connect_kwargs, channel)
+
+    def stop(self):
+        self._listener.stop()
+
+
+live_events = LiveEventCache()
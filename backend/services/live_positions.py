@@ -0,0 +1,207 @@
+"""
+live_positions.py
+
+In-process cache of the latest positions per tag, fed by Postgres
+LISTEN/NOTIFY.
+
+A statement-level AFTER INSERT trigger on realtime_location_data NOTIFYs
+LIVE_POSITION_CHANNEL with the newest sample of every tag in each insert,
+so every writer (ingestion, simulators, bulk loads) feeds the same stream.
+One listener thread per API process (see pg_notify) applies
+those to a ring buffer per tag and pushes the changes to subscribed
+streaming clients, so any number of open dashboards costs one LISTEN connection
+instead of one query per poll.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import text
+
+from backend.services.pg_notify import NotifyListener, as_utc
+
+LIVE_POSITION_CHANNEL = "live_positions"
+
+# pg_notify payloads must stay under 8000 bytes: [id, x, y, recorded_at]
+# entries are well under 100 bytes each
+TAGS_PER_NOTIFY = 64
+
+SEED_SQL = """
+    SELECT id, x_coordinate, y_coordinate, recorded_at
+    FROM realtime_location_data
+    WHERE recorded_at >= now() - %s * interval '1 second'
+    ORDER BY recorded_at
+"""
+
+
+# -----------------------------
+# Producer side (trigger)
+# -----------------------------
+NOTIFY_TRIGGER_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION notify_live_positions() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        payload text;
+    BEGIN
+        FOR payload IN
+            SELECT json_agg(json_build_array(id, x_coordinate, y_coordinate, recorded_at))::text
+            FROM (
+                SELECT *, (row_number() OVER (ORDER BY id) - 1) / {TAGS_PER_NOTIFY} AS chunk
+                FROM (
+                    SELECT DISTINCT ON (id) id, x_coordinate, y_coordinate, recorded_at
+                    FROM new_rows
+                    ORDER BY id, recorded_at DESC
+                ) latest
+            ) chunked
+            GROUP BY chunk
+        LOOP
+            -- Delivered to listeners only when the insert commits
+            PERFORM pg_notify('{LIVE_POSITION_CHANNEL}', payload);
+        END LOOP;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS realtime_location_data_live_positions ON realtime_location_data",
+    """
+    CREATE TRIGGER realtime_location_data_live_positions
+    AFTER INSERT ON realtime_location_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_live_positions()
+    """,
+]
+
+
+def install_trigger(conn):
+    """(Re)create the NOTIFY trigger; called by init_db."""
+    for statement in NOTIFY_TRIGGER_SQL:
+        conn.execute(text(statement))
+
+
+# -----------------------------
+# Consumer side (API process)
+# -----------------------------
+def _position(user_id, x, y, recorded_at):
+    return {"id": user_id, "x": x, "y": y, "recorded_at": recorded_at.isoformat()}
+
+
+class LivePositionCache:
+    """
+    Keeps the last `history` positions of every tag. Subscribers get an
+    asyncio.Queue of deltas ({id: position}); a slow subscriber loses its
+    oldest deltas rather than holding up the others.
+    """
+
+    def __init__(self, history=60, subscriber_queue_size=100):
+        self.history = history
+        self.subscriber_queue_size = subscriber_queue_size
+
+        self._positions = {}        # id -> deque of (x, y, recorded_at)
+        self._lock = threading.Lock()
+        self._subscribers = {}      # asyncio.Queue -> event loop
+        self._seed_seconds = 60
+        self._listener = NotifyListener("live-position-listener", self._on_notify, on_connect=self._seed)
+
+        self.updates = 0
+
+    @property
+    def connected(self):
+        return self._listener.connected
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def update(self, samples):
+        delta = {}
+        with self._lock:
+            for user_id, x, y, recorded_at in samples:
+                recorded_at = as_utc(recorded_at)
+                ring = self._positions.setdefault(user_id, deque(maxlen=self.history))
+                if ring and recorded_at <= ring[-1][2]:
+                    continue
+                ring.append((x, y, recorded_at))
+                delta[user_id] = _position(user_id, x, y, recorded_at)
+            self.updates += 1
+            subscribers = list(self._subscribers.items())
+
+        if delta:
+            for queue, loop in subscribers:
+                loop.call_soon_threadsafe(self._offer, queue, delta)
+        return delta
+
+    @staticmethod
+    def _offer(queue, delta):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(delta)
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def latest(self):
+        with self._lock:
+            return {
+                user_id: _position(user_id, *ring[-1])
+                for user_id, ring in self._positions.items()
+                if ring
+            }
+
+    def recent(self, seconds=60, limit=1000):
+        """Same shape as the DB-backed recent locations: newest first."""
+        since = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+        with self._lock:
+            rows = [
+                (recorded_at, user_id, x, y)
+                for user_id, ring in self._positions.items()
+                for x, y, recorded_at in ring
+                if recorded_at >= since
+            ]
+        rows.sort(key=lambda r: r[0], reverse=True)
+        return [
+            {"id": user_id, "recorded_at": recorded_at, "x": x, "y": y}
+            for recorded_at, user_id, x, y in rows[:limit]
+        ]
+
+    # -----------------------------
+    # Subscriptions
+    # -----------------------------
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    # -----------------------------
+    # LISTEN loop
+    # -----------------------------
+    def start(self, connect_kwargs, channel=LIVE_POSITION_CHANNEL, seed_seconds=60):
+        self._seed_seconds = seed_seconds
+        self._listener.start(connect_kwargs, channel)
+
+    def stop(self):
+        self._listener.stop()
+
+    def _seed(self, cur):
+        # Anything written before LISTEN took effect comes from the table
+        cur.execute(SEED_SQL, (self._seed_seconds,))
+        self.update(cur.fetchall())
+
+    def _on_notify(self, items):
+        self.update([
+            (user_id, x, y, datetime.fromisoformat(recorded_at))
+            for user_id, x, y, recorded_at in items
+        ])
+
+
+live_positions = LivePositionCache()
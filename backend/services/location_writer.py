@@ -0,0 +1,173 @@
+"""
+location_writer.py
+
+Buffered writer for realtime_location_data.
+
+Samples are collected in memory and written in one execute_values round
+trip (one commit) when either `max_rows` samples are buffered or the oldest
+buffered sample has waited `max_latency_ms`. The live position NOTIFY and
+the tag_last_seen upsert come from triggers on the table (see
+live_positions and tag_health).
+"""
+
+import threading
+import time
+from collections import deque
+
+from psycopg2.extras import execute_values
+
+
+LOCATION_COLUMNS = "(id, x_coordinate, y_coordinate, recorded_at)"
+
+
+class BufferedLocationWriter:
+    """
+    Memory is bounded by `max_buffered_rows`: if the database is unreachable
+    long enough for the buffer to fill up, the oldest samples are dropped
+    (and counted in `rows_dropped`).
+
+    `connect` is a zero-argument callable returning a psycopg2 connection;
+    it is called again after a failed flush so a dropped connection heals.
+    """
+
+    def __init__(
+        self,
+        connect,
+        max_rows=500,
+        max_latency_ms=250,
+        max_buffered_rows=50_000,
+        table="realtime_location_data",
+    ):
+        self.connect = connect
+        self.max_rows = max_rows
+        self.max_latency_ms = max_latency_ms
+        self.max_buffered_rows = max_buffered_rows
+        self.insert_sql = f"INSERT INTO {table} {LOCATION_COLUMNS} VALUES %s"
+
+        self._conn = None
+        self._buffer = deque()
+        self._oldest = None          # monotonic time of the oldest buffered sample
+        self._lock = threading.Lock()        # guards the buffer
+        self._flush_lock = threading.Lock()  # one flush (DB write) at a time
+        self._stop = threading.Event()
+        self._ticker = None
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_failed = False
+
+    # -----------------------------
+    # Buffering
+    # -----------------------------
+    def add(self, user_id, x, y, recorded_at):
+        with self._lock:
+            self._append([(user_id, x, y, recorded_at)])
+            # After a failure, retries are paced by flush_if_due instead
+            due = len(self._buffer) >= self.max_rows and not self.last_flush_failed
+        if due:
+            self.flush()
+
+    def _append(self, rows):
+        # Caller holds self._lock
+        self._buffer.extend(rows)
+        overflow = len(self._buffer) - self.max_buffered_rows
+        for _ in range(max(0, overflow)):
+            self._buffer.popleft()
+        self.rows_dropped += max(0, overflow)
+        if self._oldest is None and self._buffer:
+            self._oldest = time.monotonic()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush_if_due(self):
+        with self._lock:
+            due = (
+                self._oldest is not None
+                and (time.monotonic() - self._oldest) * 1000 >= self.max_latency_ms
+            )
+        if due:
+            self.flush()
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def flush(self):
+        """Write everything buffered; on failure the rows are kept for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._buffer)
+                self._buffer.clear()
+                self._oldest = None
+
+            if not rows:
+                return 0
+
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = self.connect()
+                with self._conn.cursor() as cur:
+                    execute_values(cur, self.insert_sql, rows, page_size=self.max_rows)
+                self._conn.commit()
+            except Exception as e:
+                self.failed_flushes += 1
+                self.last_flush_failed = True
+                print(f"Location flush failed ({len(rows)} rows kept): {e}")
+                self._reset_connection()
+                with self._lock:
+                    # Failed rows go back in front of anything that arrived meanwhile
+                    newer = list(self._buffer)
+                    self._buffer.clear()
+                    self._oldest = None
+                    self._append(rows + newer)
+                return 0
+
+            self.rows_written += len(rows)
+            self.flushes += 1
+            self.last_flush_failed = False
+            return len(rows)
+
+    def _reset_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self):
+        """Start a background ticker so a quiet buffer is still flushed within max_latency_ms."""
+        if self._ticker is not None:
+            return
+        self._stop.clear()
+        self._ticker = threading.Thread(target=self._tick, name="location-writer-ticker", daemon=True)
+        self._ticker.start()
+
+    def _tick(self):
+        interval = max(self.max_latency_ms / 4000, 0.005)
+        while not self._stop.wait(interval):
+            self.flush_if_due()
+
+    def close(self):
+        """Stop the ticker, flush what is left and close the connection."""
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+            self._ticker = None
+        self.flush()
+        self._reset_connection()
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -0,0 +1,156 @@
+"""
+mobility.py
+
+Bounded-size mobility data for the reports.
+
+The heatmap is binned inside Postgres (one row per grid cell), and the
+movement path is decimated in time inside Postgres to a fixed number of
+slots before it reaches Python, then simplified with Douglas-Peucker down
+to the point budget. Response size depends on the grid and the budget,
+not on how many samples the user has. Without a start, only the last
+MOBILITY_DEFAULT_DAYS before `end` (or now) are read, so the queries stay
+bounded too.
+"""
+
+import heapq
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import text
+
+MOBILITY_BUCKET = 20            # heatmap cell size (same units as x/y)
+MOBILITY_MAX_POINTS = 500       # movement_path point budget
+MOBILITY_DEFAULT_DAYS = 7       # window read when no start is given
+PATH_METHODS = ("dp", "time")
+# Douglas-Peucker starts from this many time slots per output point
+DP_OVERSAMPLE = 8
+
+RANGE_SQL = text("""
+    SELECT min(recorded_at), max(recorded_at)
+    FROM realtime_location_data
+    WHERE id = :uid
+      AND (CAST(:start AS timestamptz) IS NULL OR recorded_at >= :start)
+      AND (CAST(:end AS timestamptz) IS NULL OR recorded_at <= :end)
+""")
+
+HEATMAP_SQL = text("""
+    SELECT
+        (round(x_coordinate / :bucket) * :bucket)::bigint AS bx,
+        (round(y_coordinate / :bucket) * :bucket)::bigint AS by,
+        count(*) AS samples
+    FROM realtime_location_data
+    WHERE id = :uid AND recorded_at BETWEEN :start AND :end
+    GROUP BY 1, 2
+""")
+
+# First sample of every time slot, oldest first
+PATH_SQL = text("""
+    SELECT DISTINCT ON (slot) x_coordinate, y_coordinate, recorded_at
+    FROM (
+        SELECT
+            x_coordinate, y_coordinate, recorded_at,
+            floor(extract(epoch FROM recorded_at - :start) / :step) AS slot
+        FROM realtime_location_data
+        WHERE id = :uid AND recorded_at BETWEEN :start AND :end
+    ) s
+    ORDER BY slot, recorded_at
+""")
+
+
+# -----------------------------
+# Path simplification
+# -----------------------------
+def _farthest(xs, ys, a, b):
+    """(distance, index) of the point between a and b farthest from segment a-b."""
+    if b - a < 2:
+        return 0.0, None
+    px, py = xs[a + 1:b], ys[a + 1:b]
+    dx, dy = xs[b] - xs[a], ys[b] - ys[a]
+    length = np.hypot(dx, dy)
+    if length == 0:
+        dist = np.hypot(px - xs[a], py - ys[a])
+    else:
+        dist = np.abs(dy * (px - xs[a]) - dx * (py - ys[a])) / length
+    i = int(np.argmax(dist))
+    return float(dist[i]), a + 1 + i
+
+
+def simplify_path(xs, ys, max_points):
+    """
+    Douglas-Peucker driven by a point budget instead of a tolerance: keep
+    splitting the segment with the largest deviation until `max_points`
+    points are kept. Returns the sorted indices of the kept points.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    n = len(xs)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 2:
+        return np.arange(min(n, max_points))
+
+    keep = [0, n - 1]
+    heap = []
+
+    def push(a, b):
+        dist, i = _farthest(xs, ys, a, b)
+        if i is not None:
+            heapq.heappush(heap, (-dist, a, b, i))
+
+    push(0, n - 1)
+    while heap and len(keep) < max_points:
+        _, a, b, i = heapq.heappop(heap)
+        keep.append(i)
+        push(a, i)
+        push(i, b)
+
+    return np.sort(np.array(keep))
+
+
+# -----------------------------
+# Queries
+# -----------------------------
+def time_range(db, user_id, start=None, end=None):
+    return db.execute(RANGE_SQL, {"uid": user_id, "start": start, "end": end}).first()
+
+
+def heatmap(db, user_id, start, end, bucket=MOBILITY_BUCKET):
+    rows = db.execute(HEATMAP_SQL, {"uid": user_id, "start": start, "end": end, "bucket": bucket}).fetchall()
+    return {f"{r.bx},{r.by}": r.samples for r in rows}
+
+
+def movement_path(db, user_id, start, end, max_points=MOBILITY_MAX_POINTS, method="dp"):
+    if method not in PATH_METHODS:
+        raise ValueError(f"Unknown path method: {method}")
+
+    slots = max_points * DP_OVERSAMPLE if method == "dp" else max_points
+    # Slightly wider step so the newest sample does not open an extra slot
+    step = max((end - start).total_seconds() / slots, 1e-3) * 1.0001
+
+    rows = db.execute(PATH_SQL, {"uid": user_id, "start": start, "end": end, "step": step}).fetchall()
+
+    if method == "dp" and len(rows) > max_points:
+        kept = simplify_path([r.x_coordinate for r in rows], [r.y_coordinate for r in rows], max_points)
+        rows = [rows[i] for i in kept]
+
+    return [
+        {"x": r.x_coordinate, "y": r.y_coordinate, "timestamp": str(r.recorded_at)}
+        for r in rows
+    ]
+
+
+def mobility_summary(db, user_id, start=None, end=None, bucket=MOBILITY_BUCKET,
+                     max_points=MOBILITY_MAX_POINTS, method="dp"):
+    if start is None:
+        start = (end or datetime.now(timezone.utc)) - timedelta(days=MOBILITY_DEFAULT_DAYS)
+
+    first, last = time_range(db, user_id, start, end)
+    if first is None:
+        return {"zones_visited": [], "heatmap": {}, "movement_path": []}
+
+    cells = heatmap(db, user_id, first, last, bucket)
+    return {
+        "zones_visited": list(cells.keys()),
+        "heatmap": cells,
+        "movement_path": movement_path(db, user_id, first, last, max_points, method),
+    }
@@ -0,0 +1,351 @@
+"""
+offline_detection.py
+
+Event detection on location samples held in memory, with no database.
+
+Samples come from a Parquet, NPZ or CSV dump, or a DataFrame, as columns
+id, x, y, recorded_at (x_coordinate / y_coordinate are accepted too). The
+pipeline is the same as run_event_detection: grid proximity pairs,
+connected groups per timestamp, consolidation, the duration filter and
+participant centroids. The result is the events and sessions that would
+have been written, numbered from 1.
+
+Export a time range of realtime_location_data and re-run detection on it:
+
+    python -m backend.services.offline_detection export --since 2025-01-06 --until 2025-01-13 --out week.parquet
+    python -m backend.services.offline_detection detect week.parquet --json week_events.json
+
+--workers N splits the samples into time shards run in a process pool
+(0 = one per core); the events are the same as the single-process run.
+
+Parquet needs pyarrow (pip install pyarrow); NPZ and CSV do not.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from backend.api import event_detection as ed
+from backend.services.proximity import stream_proximity_pairs
+
+SAMPLE_COLUMNS = ["id", "x", "y", "recorded_at"]
+EXPORT_CHUNK_ROWS = 200_000
+
+EXPORT_SQL = text("""
+    SELECT id, x_coordinate AS x, y_coordinate AS y, recorded_at
+    FROM realtime_location_data
+    WHERE recorded_at >= :since AND recorded_at < :until
+    ORDER BY recorded_at
+""")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Parquet support needs pyarrow: pip install pyarrow "
+            "(or export/load .npz or .csv instead)"
+        ) from e
+    return pyarrow
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+def normalize_samples(frame):
+    """id/x/y/recorded_at frame with int64 ids, float x/y and UTC timestamps."""
+    frame = frame.rename(columns={"x_coordinate": "x", "y_coordinate": "y"})
+    missing = [c for c in SAMPLE_COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Location samples are missing columns: {missing}")
+
+    # Naive timestamps are UTC, as written by ingestion. CSV dumps mix
+    # whole-second and fractional timestamps, so don't infer one format.
+    recorded_at = pd.to_datetime(frame["recorded_at"], utc=True, format="ISO8601")
+
+    return pd.DataFrame({
+        "id": frame["id"].to_numpy(dtype=np.int64),
+        "x": frame["x"].to_numpy(dtype=np.float64),
+        "y": frame["y"].to_numpy(dtype=np.float64),
+        "recorded_at": recorded_at.reset_index(drop=True),
+    })
+
+
+def load_samples(source):
+    """Samples from a DataFrame or a .parquet / .npz / .csv path."""
+    if isinstance(source, pd.DataFrame):
+        return normalize_samples(source)
+
+    path = os.fspath(source)
+    suffix = os.path.splitext(path)[1].lower()
+
+    if suffix == ".parquet":
+        _require_pyarrow()
+        return normalize_samples(pd.read_parquet(path))
+    if suffix == ".npz":
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        return normalize_samples(pd.DataFrame(arrays))
+    if suffix == ".csv":
+        # The default float parser can be off by one ulp from what to_csv wrote
+        return normalize_samples(pd.read_csv(path, float_precision="round_trip"))
+    raise ValueError(f"Unsupported sample file type: {path} (use .parquet, .npz or .csv)")
+
+
+def save_samples(samples, path):
+    """Write samples as .parquet / .npz / .csv (by extension)."""
+    samples = normalize_samples(samples)
+    suffix = os.path.splitext(os.fspath(path))[1].lower()
+
+    if suffix == ".parquet":
+        _require_pyarrow()
+        samples.to_parquet(path, index=False)
+    elif suffix == ".npz":
+        np.savez(
+            path,
+            id=samples["id"].to_numpy(),
+            x=samples["x"].to_numpy(),
+            y=samples["y"].to_numpy(),
+            # Naive UTC; normalize_samples localizes it again on load
+            recorded_at=samples["recorded_at"].dt.tz_localize(None).to_numpy(dtype="datetime64[us]"),
+        )
+    elif suffix == ".csv":
+        samples.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unsupported sample file type: {path} (use .parquet, .npz or .csv)")
+
+
+# -----------------------------
+# Pipeline stages
+# -----------------------------
+def proximity_pairs(samples, downsample_interval=1):
+    """Same pairs as get_proximity_data_grid, from samples already in memory."""
+    # Same buckets as the SQL: floor(epoch seconds / interval)
+    epoch = (samples["recorded_at"] - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)
+    frame = samples.assign(bucket=np.floor(epoch / int(downsample_interval)))
+    frame = frame.sort_values("bucket", kind="stable", ignore_index=True)
+    return stream_proximity_pairs([frame], float(ed.DISTANCE_THRESHOLD_FEET))
+
+
+def event_centroids(samples, events):
+    """
+    Drop-in for get_numeric_centroids: mean x/y of every participant sample in
+    [start_time, end_time], from per-user prefix sums instead of a query.
+    """
+    per_user = {
+        user_id: (
+            group["recorded_at"].dt.tz_localize(None).to_numpy(dtype="datetime64[ns]"),
+            np.concatenate([[0.0], np.cumsum(group["x"].to_numpy())]),
+            np.concatenate([[0.0], np.cumsum(group["y"].to_numpy())]),
+        )
+        for user_id, group in samples.sort_values("recorded_at", kind="stable").groupby("id", sort=False)
+    }
+
+    centroids = {}
+    for i, event in enumerate(events):
+        start = pd.Timestamp(event["start_time"]).tz_convert("UTC").tz_localize(None).to_datetime64()
+        end = pd.Timestamp(event["end_time"]).tz_convert("UTC").tz_localize(None).to_datetime64()
+        count, sum_x, sum_y = 0, 0.0, 0.0
+        for user_id in event["users"]:
+            if user_id not in per_user:
+                continue
+            times, cx, cy = per_user[user_id]
+            lo = np.searchsorted(times, start, side="left")
+            hi = np.searchsorted(times, end, side="right")
+            count += hi - lo
+            sum_x += cx[hi] - cx[lo]
+            sum_y += cy[hi] - cy[lo]
+        if count:
+            centroids[i] = (sum_x / count, sum_y / count)
+    return centroids
+
+
+def number_events(events):
+    """
+    (events, sessions) as write_events would store them, deduplicated by
+    event_key and numbered from 1.
+    """
+    by_key = {}
+    for event in events:
+        by_key.setdefault(ed.event_key(event), event)
+
+    numbered, sessions = [], []
+    for event_id, (key, event) in enumerate(by_key.items(), start=1):
+        users = sorted({int(u) for u in event["users"]})
+        numbered.append({
+            "event_id": event_id,
+            "start_time": event["start_time"],
+            "end_time": event["end_time"],
+            "x_event": event["x_event"],
+            "y_event": event["y_event"],
+            "users": users,
+            "event_key": key,
+            "participant_count": len(users),
+        })
+        for user_id, start_time, end_time in ed.event_sessions(event):
+            sessions.append({
+                "id": user_id,
+                "event_id": event_id,
+                "start_time": start_time,
+                "end_time": end_time,
+            })
+    return numbered, sessions
+
+
+def detect_events(source, downsample_interval=1):
+    """Run the whole detection pipeline on in-memory samples; returns {"events", "sessions"}."""
+    samples = load_samples(source)
+
+    pairs = proximity_pairs(samples, downsample_interval)
+    if pairs.empty:
+        return {"events": [], "sessions": []}
+
+    raw = ed.group_connected_events(pairs)
+    consolidated = ed.consolidate_events(raw)
+    located = ed.locate_events(samples, consolidated, centroids=event_centroids)
+
+    events, sessions = number_events(located)
+    return {"events": events, "sessions": sessions}
+
+
+def detect_sample_shard(samples, until, downsample_interval=1):
+    """Proximity, grouping and consolidation for one shard of samples; runs in a worker process."""
+    pairs = proximity_pairs(samples, downsample_interval)
+    raw = ed.group_connected_events(pairs) if not pairs.empty else []
+    closed, still_open = ed.consolidate_shard(raw, until)
+    return len(raw), closed, still_open, until
+
+
+def detect_events_parallel(source, downsample_interval=1, workers=None):
+    """detect_events with the samples split into time shards processed in a process pool."""
+    samples = load_samples(source)
+    if samples.empty:
+        return {"events": [], "sessions": []}
+
+    bucket = int(downsample_interval)
+    workers = workers or ed.PARALLEL_WORKERS or os.cpu_count() or 1
+    since = samples["recorded_at"].min().to_pydatetime()
+    until = samples["recorded_at"].max().to_pydatetime() + timedelta(seconds=bucket)
+    bounds = ed.shard_bounds(since, until, workers * ed.SHARDS_PER_WORKER, bucket)
+
+    times = samples["recorded_at"]
+    shard_args = []
+    for k, (start, end) in enumerate(bounds):
+        shard = samples[(times >= start) & (times < end)].reset_index(drop=True)
+        shard_args.append((shard, None if k == len(bounds) - 1 else end, downsample_interval))
+
+    consolidated = ed.stitch_shards(ed.run_shards(detect_sample_shard, shard_args, workers))
+    located = ed.locate_events(samples, consolidated, centroids=event_centroids)
+
+    events, sessions = number_events(located)
+    return {"events": events, "sessions": sessions}
+
+
+# -----------------------------
+# Export
+# -----------------------------
+def export_samples(db, path, since, until, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Stream realtime_location_data rows in [since, until) into a sample file.
+    Parquet is written row group by row group; other formats are collected
+    in memory first. Returns the number of rows written.
+    """
+    # Server-side cursor for this statement only, not the session's connection
+    chunks = pd.read_sql(
+        EXPORT_SQL.execution_options(stream_results=True),
+        db.connection(),
+        params={"since": since, "until": until},
+        chunksize=chunk_rows,
+    )
+
+    if os.path.splitext(os.fspath(path))[1].lower() != ".parquet":
+        frames = [normalize_samples(c) for c in chunks]
+        samples = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SAMPLE_COLUMNS)
+        save_samples(samples, path)
+        return len(samples)
+
+    pa = _require_pyarrow()
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(normalize_samples(chunk), preserve_index=False)
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        save_samples(pd.DataFrame(columns=SAMPLE_COLUMNS), path)
+    return rows
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _json_default(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export location samples and run event detection offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="dump realtime_location_data in [since, until) to a file")
+    export.add_argument("--since", required=True, type=pd.Timestamp, help="UTC unless an offset is given")
+    export.add_argument("--until", required=True, type=pd.Timestamp)
+    export.add_argument("--out", required=True, help=".parquet, .npz or .csv")
+
+    detect = commands.add_parser("detect", help="run event detection on a sample file")
+    detect.add_argument("path", help=".parquet, .npz or .csv")
+    detect.add_argument("--downsample-interval", type=int, default=1)
+    detect.add_argument("--json", help="write events and sessions to this file")
+    detect.add_argument("--workers", type=int, default=1, help="time shards in a process pool (0 = one per core)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from backend.database_engine import get_sessionmaker
+
+        since = args.since if args.since.tzinfo else args.since.tz_localize("UTC")
+        until = args.until if args.until.tzinfo else args.until.tz_localize("UTC")
+        start = time.perf_counter()
+        with get_sessionmaker()() as db:
+            ed.lift_statement_timeout(db)
+            rows = export_samples(db, args.out, since.to_pydatetime(), until.to_pydatetime())
+        print(f"Exported {rows:,} samples to {args.out} in {time.perf_counter() - start:.2f}s")
+        return
+
+    start = time.perf_counter()
+    samples = load_samples(args.path)
+    loaded = time.perf_counter()
+    if args.workers == 1:
+        result = detect_events(samples, args.downsample_interval)
+    else:
+        result = detect_events_parallel(samples, args.downsample_interval, args.workers or None)
+    done = time.perf_counter()
+
+    print(f"{len(samples):,} samples loaded in {loaded - start:.2f}s; "
+          f"{len(result['events']):,} events, {len(result['sessions']):,} sessions in {done - loaded:.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2, default=_json_default)
+
+
+if __name__ == "__main__":
+    main()
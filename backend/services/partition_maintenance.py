@@ -0,0 +1,277 @@
+"""
+partition_maintenance.py
+
+Range partitions for realtime_location_data on recorded_at.
+
+Partitions cover PARTITION_INTERVAL_DAYS each (1 = daily, 7 = weekly,
+starting Monday) and are named realtime_location_data_pYYYYMMDD after their
+first day. Maintenance pre-creates partitions PARTITION_DAYS_AHEAD into the
+future and detaches partitions that are entirely older than RETENTION_DAYS,
+then drops them (or moves them to ARCHIVE_SCHEMA), so retention is a
+metadata operation instead of a large DELETE.
+
+A DEFAULT partition catches rows no range partition covers, so ingestion
+keeps working if maintenance has not run for longer than
+PARTITION_DAYS_AHEAD. The next run creates the missing partitions and
+moves those rows into them.
+
+Run from cron or by hand:
+
+    python -m backend.services.partition_maintenance
+    python -m backend.services.partition_maintenance --migrate   # one-off, see migrate_to_partitioned
+"""
+
+import argparse
+import re
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import text
+
+TABLE = "realtime_location_data"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+PARTITION_INTERVAL_DAYS = 1
+PARTITION_DAYS_AHEAD = 7
+RETENTION_DAYS = 90
+ARCHIVE_SCHEMA = None          # e.g. "archive" to keep detached partitions
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+# -----------------------------
+# Naming and bounds
+# -----------------------------
+def partition_start(day, interval_days=PARTITION_INTERVAL_DAYS):
+    if interval_days == 7:
+        return day - timedelta(days=day.weekday())
+    return day - timedelta(days=(day.toordinal() % interval_days))
+
+
+def partition_name(start):
+    return f"{TABLE}_p{start:%Y%m%d}"
+
+
+def _utc_midnight(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+# -----------------------------
+# Queries
+# -----------------------------
+def is_partitioned(conn):
+    return bool(conn.execute(text("""
+        SELECT 1
+        FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = :table AND pg_table_is_visible(c.oid)
+    """), {"table": TABLE}).scalar())
+
+
+def list_partitions(conn):
+    """[(name, lower, upper)] for every attached partition, oldest first."""
+    rows = conn.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table AND pg_table_is_visible(parent.oid)
+    """), {"table": TABLE}).fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if not match:
+            continue  # DEFAULT partition
+        lower, upper = (datetime.fromisoformat(v) for v in match.groups())
+        partitions.append((name, lower, upper))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def default_partition_range(conn):
+    """(oldest, newest) recorded_at in the DEFAULT partition, or None if it is empty."""
+    oldest, newest = conn.execute(text(
+        f"SELECT min(recorded_at), max(recorded_at) FROM {DEFAULT_PARTITION}"
+    )).first()
+    return None if oldest is None else (oldest, newest)
+
+
+# -----------------------------
+# Maintenance
+# -----------------------------
+def ensure_default_partition(conn):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+
+def _create_partition(conn, name, lower, upper):
+    bounds = f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    in_range = {"lower": lower, "upper": upper}
+
+    stranded = conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+        f"WHERE recorded_at >= :lower AND recorded_at < :upper)"
+    ), in_range).scalar()
+    if not stranded:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} {bounds}"))
+        return
+
+    # Postgres refuses a range partition while the DEFAULT partition holds
+    # rows in its range: build it standalone, move the rows, then attach.
+    # DML on the partitions directly does not fire the parent's triggers.
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE recorded_at >= :lower AND recorded_at < :upper
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), in_range)
+    conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} {bounds}"))
+
+
+def ensure_partitions(conn, start_day, end_day, interval_days=PARTITION_INTERVAL_DAYS):
+    """Create every missing partition needed to cover [start_day, end_day]."""
+    existing = list_partitions(conn)
+    created = []
+
+    day = partition_start(start_day, interval_days)
+    while day <= end_day:
+        lower, upper = _utc_midnight(day), _utc_midnight(day + timedelta(days=interval_days))
+        # Clip around partitions that already cover part of the range (e.g. a legacy one)
+        for _, lo, hi in existing:
+            if lo <= lower < hi:
+                lower = hi
+            if lower < lo < upper:
+                upper = lo
+        if lower < upper:
+            name = partition_name(lower.date())
+            _create_partition(conn, name, lower, upper)
+            existing.append((name, lower, upper))
+            created.append(name)
+        day += timedelta(days=interval_days)
+
+    return created
+
+
+def drop_expired_partitions(conn, retention_days=RETENTION_DAYS, archive_schema=ARCHIVE_SCHEMA):
+    """Detach partitions whose whole range is older than the retention window."""
+    cutoff = _utc_midnight(date.today() - timedelta(days=retention_days))
+    removed = []
+
+    for name, _, upper in list_partitions(conn):
+        if upper > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        if archive_schema:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+
+    # Stragglers the range partitions were never created for
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE recorded_at < :cutoff"), {"cutoff": cutoff})
+
+    return removed
+
+
+def run_maintenance(engine, days_ahead=PARTITION_DAYS_AHEAD, retention_days=RETENTION_DAYS):
+    with engine.begin() as conn:
+        # Moving rows out of DEFAULT can outlast the pool's statement timeout
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        if not is_partitioned(conn):
+            print(f"{TABLE} is not partitioned; run with --migrate first.")
+            return [], []
+        ensure_default_partition(conn)
+
+        today = date.today()
+        start, end = today - timedelta(days=1), today + timedelta(days=days_ahead)
+        # Cover whatever landed in the DEFAULT partition while maintenance was not running
+        stranded = default_partition_range(conn)
+        if stranded:
+            oldest, newest = (ts.astimezone(timezone.utc).date() for ts in stranded)
+            start = min(start, max(oldest, today - timedelta(days=retention_days)))
+            end = max(end, newest)
+
+        created = ensure_partitions(conn, start, end)
+        removed = drop_expired_partitions(conn, retention_days)
+    return created, removed
+
+
+# -----------------------------
+# One-off migration
+# -----------------------------
+def migrate_to_partitioned(engine, metadata):
+    """
+    Convert an existing unpartitioned realtime_location_data in place.
+    The old table is renamed, the partitioned table created from the ORM
+    definition, and the old rows attached as a single legacy partition
+    covering their whole range. No rows are copied, but ATTACH builds the
+    parent's indexes on the legacy table, which on a large table takes
+    about as long as creating them from scratch, under an exclusive lock.
+    The live position and last-seen triggers move to the new table in the
+    same transaction. Retention drops the legacy partition once all of its
+    rows have expired.
+    """
+    from backend.services import live_positions, tag_health
+
+    legacy = f"{TABLE}_legacy"
+
+    with engine.begin() as conn:
+        # ATTACH builds indexes on the whole legacy table
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        if is_partitioned(conn):
+            print(f"{TABLE} is already partitioned.")
+            return
+
+        bounds = conn.execute(text(f"SELECT min(recorded_at), max(recorded_at) FROM {TABLE}")).first()
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {TABLE}_pkey"))
+        # Triggers with transition tables cannot be on a partition; the new parent gets them below
+        triggers = conn.execute(text(
+            "SELECT tgname FROM pg_trigger WHERE tgrelid = CAST(:table AS regclass) AND NOT tgisinternal"
+        ), {"table": legacy}).scalars().all()
+        for trigger in triggers:
+            conn.execute(text(f'DROP TRIGGER "{trigger}" ON {legacy}'))
+
+        metadata.tables[TABLE].create(conn)
+        live_positions.install_trigger(conn)
+        tag_health.install_trigger(conn)
+
+        if bounds[0] is not None:
+            lower = _utc_midnight(bounds[0].astimezone(timezone.utc).date())
+            upper = _utc_midnight(bounds[1].astimezone(timezone.utc).date() + timedelta(days=1))
+            # The CHECK lets ATTACH skip its validation scan
+            conn.execute(text(
+                f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_range CHECK "
+                f"(recorded_at >= '{lower.isoformat()}' AND recorded_at < '{upper.isoformat()}')"
+            ))
+            conn.execute(text(
+                f"ALTER TABLE {TABLE} ATTACH PARTITION {legacy} "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            ))
+
+    print(f"{TABLE} migrated; old rows attached as {legacy}.")
+
+
+def main():
+    from backend.database_engine import Base, get_engine
+
+    engine = get_engine()
+
+    parser = argparse.ArgumentParser(description="Maintain realtime_location_data partitions.")
+    parser.add_argument("--migrate", action="store_true", help="convert an unpartitioned table first")
+    parser.add_argument("--days-ahead", type=int, default=PARTITION_DAYS_AHEAD)
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    args = parser.parse_args()
+
+    if args.migrate:
+        migrate_to_partitioned(engine, Base.metadata)
+
+    created, removed = run_maintenance(engine, args.days_ahead, args.retention_days)
+    print(f"Created partitions: {created or 'none'}")
+    print(f"Removed partitions: {removed or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+pg_notify.py
+
+Postgres LISTEN/NOTIFY plumbing shared by the live caches (live_positions,
+live_events) and the streaming detector that feeds one of them.
+
+Payloads are JSON arrays of items, split so each fits in a single NOTIFY.
+NotifyListener runs one LISTEN connection on its own thread, reconnects
+after errors, and hands the decoded items of every poll to a callback.
+"""
+
+import json
+import select
+import threading
+from datetime import timezone
+
+import psycopg2
+
+# pg_notify payloads must stay under 8000 bytes
+MAX_NOTIFY_PAYLOAD_BYTES = 7500
+
+
+def as_utc(ts):
+    # Ingestion stamps samples with naive UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+# -----------------------------
+# Producer side
+# -----------------------------
+def notify_payloads(items, max_bytes=MAX_NOTIFY_PAYLOAD_BYTES):
+    """JSON arrays of `items`, as few as fit under `max_bytes` each."""
+    payloads, chunk, size = [], [], 2
+    for item in items:
+        encoded = json.dumps(item)   # ASCII, so characters are bytes
+        if chunk and size + len(encoded) + 1 > max_bytes:
+            payloads.append("[" + ",".join(chunk) + "]")
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        payloads.append("[" + ",".join(chunk) + "]")
+    return payloads
+
+
+# -----------------------------
+# Consumer side
+# -----------------------------
+class NotifyListener:
+    """
+    LISTENs on `channel` and calls handle(items) with the items of every
+    payload received in one poll. `on_connect(cursor)`, if given, runs right
+    after LISTEN on each (re)connect, e.g. to seed from the table whatever
+    was written before LISTEN took effect.
+    """
+
+    def __init__(self, name, handle, on_connect=None, reconnect_sec=5):
+        self.name = name
+        self.handle = handle
+        self.on_connect = on_connect
+        self.reconnect_sec = reconnect_sec
+
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.connected = False
+
+    def start(self, connect_kwargs, channel):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._listen,
+            args=(connect_kwargs, channel),
+            name=self.name,
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _listen(self, connect_kwargs, channel):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**connect_kwargs)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {channel};")
+                    if self.on_connect:
+                        self.on_connect(cur)
+                self.connected = True
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    items = []
+                    while conn.notifies:
+                        items.extend(json.loads(conn.notifies.pop(0).payload))
+                    if items:
+                        self.handle(items)
+            except Exception as e:
+                print(f"{self.name} error, reconnecting: {e}")
+                self._stop.wait(self.reconnect_sec)
+            finally:
+                self.connected = False
+                if conn is not None:
+                    conn.close()
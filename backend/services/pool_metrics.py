@@ -0,0 +1,63 @@
+"""
+pool_metrics.py
+
+QueuePool that records how long callers wait for a connection.
+
+SQLAlchemy's QueuePool only reports its current size and checked-out count.
+MeteredQueuePool also counts the callers currently waiting, checkout
+timeouts, and average/max wait, which is what shows whether the pool is
+too small for the dashboard's request fan-out.
+"""
+
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class MeteredQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_sec = 0.0
+        self.wait_max_sec = 0.0
+
+    def _do_get(self):
+        with self._metrics_lock:
+            self.waiting += 1
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._metrics_lock:
+                self.waiting -= 1
+                if timed_out:
+                    self.timeouts += 1
+                else:
+                    self.checkouts += 1
+                    self.wait_total_sec += waited
+                    self.wait_max_sec = max(self.wait_max_sec, waited)
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                "pool_size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": self.overflow(),
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(1000 * self.wait_total_sec / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(1000 * self.wait_max_sec, 3),
+            }
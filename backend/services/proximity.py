@@ -0,0 +1,146 @@
+"""
+proximity.py
+
+In-memory proximity engine for event detection.
+
+Location samples are bucketed by time (same bucket definition as the SQL
+self-join in event_detection) and, inside every bucket, hashed into a uniform
+grid whose cell size equals the distance threshold. Two samples can only be
+within the threshold if their cells are neighbours, so each sample is only
+compared against the 3x3 block of cells around it instead of every other
+sample in the bucket.
+"""
+
+import numpy as np
+import pandas as pd
+
+PAIR_COLUMNS = ["user_a", "user_b", "recorded_at"]
+
+# 3x3 neighbourhood of a grid cell
+_NEIGHBOUR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def find_close_pairs(ids, xs, ys, buckets, threshold):
+    """
+    Return index arrays (i, j) of all sample pairs that share a bucket,
+    satisfy ids[i] < ids[j] and lie within `threshold` of each other.
+    Pairs are ordered by i (i.e. by the input order of the first sample).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    buckets = np.asarray(buckets)
+
+    n = len(ids)
+    empty = np.empty(0, dtype=np.int64)
+    if n < 2:
+        return empty, empty
+
+    # Dense bucket codes keep the packed cell key small
+    _, bucket_codes = np.unique(buckets, return_inverse=True)
+    bucket_codes = bucket_codes.astype(np.int64)
+
+    cx = np.floor(xs / threshold).astype(np.int64)
+    cy = np.floor(ys / threshold).astype(np.int64)
+    # +1 margin so neighbour offsets never wrap into another row/bucket
+    cx -= cx.min() - 1
+    cy -= cy.min() - 1
+    width = int(cx.max()) + 2
+    height = int(cy.max()) + 2
+
+    keys = (bucket_codes * width + cx) * height + cy
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    left_parts, right_parts = [], []
+    for dx, dy in _NEIGHBOUR_OFFSETS:
+        target = keys + dx * height + dy
+        lo = np.searchsorted(sorted_keys, target, side="left")
+        hi = np.searchsorted(sorted_keys, target, side="right")
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        # Expand every sample into the range of samples in the neighbour cell
+        left = np.repeat(np.arange(n, dtype=np.int64), counts)
+        starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        right = order[starts + np.arange(total, dtype=np.int64)]
+
+        keep = ids[left] < ids[right]
+        left, right = left[keep], right[keep]
+
+        ddx = xs[left] - xs[right]
+        ddy = ys[left] - ys[right]
+        close = np.sqrt(ddx * ddx + ddy * ddy) <= threshold
+
+        left_parts.append(left[close])
+        right_parts.append(right[close])
+
+    if not left_parts:
+        return empty, empty
+
+    left = np.concatenate(left_parts)
+    right = np.concatenate(right_parts)
+    pair_order = np.lexsort((right, left))
+    return left[pair_order], right[pair_order]
+
+
+def proximity_pairs_frame(samples, threshold):
+    """
+    Build the user_a/user_b/recorded_at frame for a frame of samples with
+    columns id, x, y, recorded_at and bucket. Output matches the SQL path:
+    one row per close sample pair, stamped with the first sample's time.
+    """
+    if samples.empty:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+
+    i, j = find_close_pairs(
+        samples["id"].to_numpy(),
+        samples["x"].to_numpy(),
+        samples["y"].to_numpy(),
+        samples["bucket"].to_numpy(),
+        threshold,
+    )
+
+    return pd.DataFrame({
+        "user_a": samples["id"].to_numpy()[i],
+        "user_b": samples["id"].to_numpy()[j],
+        "recorded_at": samples["recorded_at"].iloc[i].reset_index(drop=True),
+    })
+
+
+def stream_proximity_pairs(chunks, threshold):
+    """
+    Consume an iterable of sample frames sorted by bucket (e.g. the chunks
+    of pd.read_sql(..., chunksize=N)) and return one pair frame. The last
+    bucket of each chunk is held back until the next chunk arrives, so a
+    bucket split across chunks is still compared as a whole.
+    """
+    frames = []
+    carry = None
+
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            carry = None
+            continue
+
+        last_bucket = chunk["bucket"].iloc[-1]
+        tail = chunk["bucket"].to_numpy() == last_bucket
+        carry = chunk[tail]
+        ready = chunk[~tail]
+
+        if not ready.empty:
+            frames.append(proximity_pairs_frame(ready, threshold))
+
+    if carry is not None and not carry.empty:
+        frames.append(proximity_pairs_frame(carry, threshold))
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=PAIR_COLUMNS)
+
+    pairs = pd.concat(frames, ignore_index=True)
+    return pairs.sort_values("recorded_at", kind="stable", ignore_index=True)
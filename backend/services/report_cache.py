@@ -0,0 +1,87 @@
+"""
+report_cache.py
+
+Small thread-safe TTL + LRU cache used for per-user reports.
+
+Entries expire after `ttl_sec` and the least recently used entry is evicted
+beyond `maxsize`. Event detection calls invalidate() with the users whose
+user_event_sessions changed, so their next report is recomputed right away.
+A report computed while such an invalidation arrived may already be stale:
+callers take generation() before computing and pass it to set(), which
+drops the value if the key was invalidated in between.
+
+The cache and its invalidation are per process. Other uvicorn workers
+only pick up new sessions when their own entries expire (`ttl_sec`).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+REPORT_CACHE_TTL_SEC = 15
+REPORT_CACHE_MAX_ENTRIES = 512
+
+
+class TTLCache:
+
+    def __init__(self, ttl_sec, maxsize):
+        self.ttl_sec = ttl_sec
+        self.maxsize = maxsize
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._generations = {}          # key -> times invalidated
+        self._epoch = 0                 # times cleared
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key):
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        """Cache `value`, unless `key` was invalidated after `generation` was taken."""
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl_sec, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Full reports keyed by user_id
+report_cache = TTLCache(REPORT_CACHE_TTL_SEC, REPORT_CACHE_MAX_ENTRIES)
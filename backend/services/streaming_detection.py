@@ -0,0 +1,296 @@
+"""
+streaming_detection.py
+
+Event detection fed directly from ingestion.
+
+StreamingEventDetector consumes position samples as they arrive. Samples are
+held per time bucket (the same floor(epoch / interval) buckets as
+event_detection); once a bucket is `lateness_sec` behind the clock it can no
+longer receive samples, so it is paired with the grid engine, grouped per
+timestamp and fed to the same consolidation as
+run_incremental_event_detection. Every change to the active events comes
+out as a transition:
+
+    open    a group of users was first seen together
+    extend  an active event was seen again within EVENT_GAP_SECONDS (or,
+            in overlap consolidation, someone joined it)
+    close   EVENT_GAP_SECONDS passed without the group; nothing can extend it
+
+Memory is the buckets still inside the lateness window plus the active
+events, which are dropped when they close.
+
+StreamingDetectionWorker runs a detector on its own thread in the ingestion
+process, writes closed events through insert_events and NOTIFYs every
+transition on LIVE_EVENT_CHANNEL for the API (see live_events).
+"""
+
+import math
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import text
+
+from backend.api import event_detection as ed
+from backend.database_engine import get_sessionmaker
+from backend.services.pg_notify import as_utc, notify_payloads
+from backend.services.proximity import proximity_pairs_frame
+
+LIVE_EVENT_CHANNEL = "live_events"
+
+TRANSITIONS = ("open", "extend", "close")
+
+
+class StreamingEventDetector:
+    """
+    add() buffers a sample; advance(now) closes the buckets that ended more
+    than `lateness_sec` before `now` and returns the resulting transitions
+    as (kind, event) pairs. Samples for a bucket that is already closed are
+    counted in `late_samples` and ignored. At most `max_pending_samples`
+    samples are buffered; beyond that new samples are dropped.
+    """
+
+    def __init__(self, bucket_sec=1, lateness_sec=3.0, max_pending_samples=100_000):
+        self.bucket_sec = int(bucket_sec)
+        self.lateness_sec = lateness_sec
+        self.max_pending_samples = max_pending_samples
+
+        self._buckets = {}       # bucket -> [(id, x, y, recorded_at)]
+        self._pending = 0
+        self._watermark = None   # every bucket before this one is closed
+        self._open = {}          # event_id -> event
+        self._next_event_id = 1
+
+        self.samples_in = 0
+        self.late_samples = 0
+        self.dropped_samples = 0
+        self.buckets_closed = 0
+        self.counts = dict.fromkeys(TRANSITIONS, 0)
+
+    # -----------------------------
+    # Input
+    # -----------------------------
+    def add(self, user_id, x, y, recorded_at):
+        recorded_at = as_utc(recorded_at)
+        bucket = math.floor(recorded_at.timestamp() / self.bucket_sec)
+        self.samples_in += 1
+
+        if self._watermark is not None and bucket < self._watermark:
+            self.late_samples += 1
+            return False
+        if self._pending >= self.max_pending_samples:
+            self.dropped_samples += 1
+            return False
+
+        self._buckets.setdefault(bucket, []).append((int(user_id), float(x), float(y), recorded_at))
+        self._pending += 1
+        return True
+
+    # -----------------------------
+    # Time-based output
+    # -----------------------------
+    def advance(self, now=None):
+        """Close every bucket that ended `lateness_sec` before `now` (default: the clock)."""
+        now = as_utc(now or datetime.now(timezone.utc))
+        watermark = math.floor((now.timestamp() - self.lateness_sec) / self.bucket_sec)
+        if self._watermark is not None and watermark <= self._watermark:
+            return []
+        self._watermark = watermark
+        return self._process([b for b in self._buckets if b < watermark], watermark)
+
+    def flush_all(self):
+        """Close every buffered bucket and every active event (shutdown)."""
+        transitions = []
+        if self._buckets:
+            self._watermark = max(self._buckets) + 1
+            transitions = self._process(list(self._buckets), self._watermark)
+
+        for event in sorted(self._open.values(), key=lambda e: e["event_id"]):
+            transitions.append(("close", event))
+            self.counts["close"] += 1
+        self._open = {}
+        return transitions
+
+    def _process(self, buckets, watermark):
+        raw = self._group(sorted(buckets))
+        high_water = datetime.fromtimestamp(watermark * self.bucket_sec, tz=timezone.utc)
+
+        # Consolidation updates events in place; remember what they were
+        before = {event_id: (e["end_time"], len(e["users"])) for event_id, e in self._open.items()}
+        closed, still_open = ed.consolidate_events_incremental(raw, list(self._open.values()), high_water)
+        self._open = {e["event_id"]: e for e in still_open}
+
+        transitions = []
+        for event in sorted(closed, key=lambda e: e["event_id"]):
+            if event["event_id"] not in before:
+                transitions.append(("open", event))
+            transitions.append(("close", event))
+        for event in sorted(still_open, key=lambda e: e["event_id"]):
+            if event["event_id"] not in before:
+                transitions.append(("open", event))
+            elif (event["end_time"], len(event["users"])) != before[event["event_id"]]:
+                transitions.append(("extend", event))
+
+        for kind, _ in transitions:
+            self.counts[kind] += 1
+        return transitions
+
+    def _group(self, buckets):
+        # Raw groups of the given buckets, numbered on from earlier batches
+        samples = []
+        for bucket in buckets:
+            rows = self._buckets.pop(bucket)
+            self._pending -= len(rows)
+            samples.extend((*row, bucket) for row in rows)
+        self.buckets_closed += len(buckets)
+
+        if not samples:
+            return []
+
+        frame = pd.DataFrame(samples, columns=["id", "x", "y", "recorded_at", "bucket"])
+        frame["recorded_at"] = pd.to_datetime(frame["recorded_at"], utc=True)
+        pairs = proximity_pairs_frame(frame, float(ed.DISTANCE_THRESHOLD_FEET))
+        if pairs.empty:
+            return []
+
+        pairs = pairs.sort_values("recorded_at", kind="stable", ignore_index=True)
+        raw = ed.group_connected_events(pairs)
+        offset = self._next_event_id - 1
+        self._next_event_id += len(raw)
+        return [{**e, "event_id": e["event_id"] + offset} for e in raw]
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def active_events(self):
+        return sorted(self._open.values(), key=lambda e: e["event_id"])
+
+    def stats(self):
+        return {
+            "samples_in": self.samples_in,
+            "late_samples": self.late_samples,
+            "dropped_samples": self.dropped_samples,
+            "pending_samples": self._pending,
+            "pending_buckets": len(self._buckets),
+            "buckets_closed": self.buckets_closed,
+            "active_events": len(self._open),
+            "opened": self.counts["open"],
+            "extended": self.counts["extend"],
+            "closed": self.counts["close"],
+        }
+
+
+# -----------------------------
+# Notifications
+# -----------------------------
+def transition_payloads(transitions):
+    """
+    JSON payloads of [kind, event_id, start, end, users] per transition,
+    split so each fits in a single NOTIFY. event_id is the detector's own
+    id, not the events table's, which only exists once the event is
+    written; ids restart with ingestion, so listeners key on it together
+    with the start time.
+    """
+    return notify_payloads(
+        [
+            kind,
+            int(event["event_id"]),
+            pd.Timestamp(event["start_time"]).isoformat(),
+            pd.Timestamp(event["end_time"]).isoformat(),
+            sorted(int(u) for u in event["users"]),
+        ]
+        for kind, event in transitions
+    )
+
+
+class StreamingDetectionWorker:
+    """
+    Drains an IngestionQueue into a StreamingEventDetector every `tick_sec`.
+    Closed events and the NOTIFYs for all transitions are written in one
+    transaction; if it fails, the closed events are retried on the next
+    tick (at most `max_unwritten_events` are kept) and the other
+    notifications are dropped.
+    """
+
+    def __init__(
+        self,
+        queue,
+        detector,
+        tick_sec=0.5,
+        batch_size=5000,
+        notify_channel=LIVE_EVENT_CHANNEL,
+        max_unwritten_events=10_000,
+    ):
+        self.queue = queue
+        self.detector = detector
+        self.tick_sec = tick_sec
+        self.batch_size = batch_size
+        self.notify_channel = notify_channel
+        self.max_unwritten_events = max_unwritten_events
+
+        self._unwritten = []
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.events_written = 0
+        self.events_dropped = 0
+        self.failed_writes = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="streaming-detection", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Process what is queued, close every active event and write it."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            batch = self.queue.get_many(self.batch_size, self.tick_sec)
+            for sample in batch:
+                self.detector.add(*sample)
+
+            if self._stop.is_set() and not batch:
+                self._publish(self.detector.flush_all())
+                return
+            self._publish(self.detector.advance())
+
+    def _publish(self, transitions):
+        closed = self._unwritten + [e for kind, e in transitions if kind == "close"]
+        if not closed and not transitions:
+            return
+
+        try:
+            with get_sessionmaker()() as db:
+                written = ed.insert_events(db, closed, commit=False) if closed else []
+                if self.notify_channel:
+                    # Delivered to listeners only when the events commit
+                    for payload in transition_payloads(transitions):
+                        db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                   {"channel": self.notify_channel, "payload": payload})
+                db.commit()
+        except Exception as e:
+            self.failed_writes += 1
+            overflow = max(0, len(closed) - self.max_unwritten_events)
+            self.events_dropped += overflow
+            self._unwritten = closed[overflow:]
+            print(f"Streaming detection write failed ({len(self._unwritten)} events kept): {e}")
+            return
+
+        self._unwritten = []
+        self.events_written += len(written)
+
+    def stats(self):
+        return {
+            **self.detector.stats(),
+            "events_written": self.events_written,
+            "events_dropped": self.events_dropped,
+            "unwritten_events": len(self._unwritten),
+            "failed_writes": self.failed_writes,
+        }
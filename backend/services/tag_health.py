@@ -0,0 +1,112 @@
+"""
+tag_health.py
+
+Last-seen time and position per tag (tag_last_seen).
+
+A statement-level AFTER INSERT trigger on realtime_location_data upserts the
+newest sample of every tag in each insert, in the same transaction as the
+samples themselves, so the table has one row per tag whichever process
+wrote them. Active-device counts over any window and the stale/offline
+listing read that table (O(tags)) instead of scanning realtime_location_data.
+"""
+
+from sqlalchemy import text
+
+# Ordered by id so concurrent inserts lock rows in the same order; the WHERE
+# keeps a late, older batch from moving last_seen back
+LAST_SEEN_TRIGGER_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION upsert_tag_last_seen() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO tag_last_seen (id, x_coordinate, y_coordinate, last_seen)
+        SELECT DISTINCT ON (id) id, x_coordinate, y_coordinate, recorded_at
+        FROM new_rows
+        ORDER BY id, recorded_at DESC
+        ON CONFLICT (id) DO UPDATE SET
+            x_coordinate = EXCLUDED.x_coordinate,
+            y_coordinate = EXCLUDED.y_coordinate,
+            last_seen = EXCLUDED.last_seen
+        WHERE tag_last_seen.last_seen < EXCLUDED.last_seen;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS realtime_location_data_last_seen ON realtime_location_data",
+    """
+    CREATE TRIGGER realtime_location_data_last_seen
+    AFTER INSERT ON realtime_location_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION upsert_tag_last_seen()
+    """,
+]
+
+# Newest sample per known tag: one index probe per tag on (id, recorded_at)
+BACKFILL_SQL = text("""
+    INSERT INTO tag_last_seen (id, x_coordinate, y_coordinate, last_seen)
+    SELECT n.id, r.x_coordinate, r.y_coordinate, r.recorded_at
+    FROM nametouid n
+    CROSS JOIN LATERAL (
+        SELECT x_coordinate, y_coordinate, recorded_at
+        FROM realtime_location_data
+        WHERE id = n.id
+        ORDER BY recorded_at DESC
+        LIMIT 1
+    ) r
+    ON CONFLICT (id) DO NOTHING
+""")
+
+ACTIVE_COUNT_SQL = text("""
+    SELECT count(*) FROM tag_last_seen
+    WHERE last_seen >= now() - :window_sec * interval '1 second'
+""")
+
+# Every known tag, including ones never seen
+HEALTH_SQL = text("""
+    SELECT
+        COALESCE(n.id, t.id) AS id,
+        n.name,
+        t.last_seen,
+        EXTRACT(EPOCH FROM now() - t.last_seen) AS seconds_since
+    FROM nametouid n
+    FULL OUTER JOIN tag_last_seen t ON t.id = n.id
+    ORDER BY t.last_seen ASC NULLS FIRST
+""")
+
+
+def install_trigger(conn):
+    """(Re)create the last-seen trigger; called by init_db."""
+    for statement in LAST_SEEN_TRIGGER_SQL:
+        conn.execute(text(statement))
+
+
+def backfill_if_empty(conn):
+    empty = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM tag_last_seen)")).scalar()
+    if empty:
+        conn.execute(BACKFILL_SQL)
+
+
+def active_count(db, window_sec):
+    return db.execute(ACTIVE_COUNT_SQL, {"window_sec": window_sec}).scalar() or 0
+
+
+def tag_health(db, stale_sec):
+    """Status of every tag: "online", "stale" (not seen within stale_sec) or "never_seen"."""
+    rows = db.execute(HEALTH_SQL).fetchall()
+
+    result = []
+    for r in rows:
+        if r.last_seen is None:
+            status = "never_seen"
+        elif r.seconds_since > stale_sec:
+            status = "stale"
+        else:
+            status = "online"
+        result.append({
+            "id": r.id,
+            "name": r.name,
+            "last_seen": r.last_seen.isoformat() if r.last_seen else None,
+            "seconds_since": round(float(r.seconds_since), 1) if r.seconds_since is not None else None,
+            "status": status,
+        })
+    return result
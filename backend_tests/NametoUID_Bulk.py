@@ -2,7 +2,7 @@
 # No CSV intermediate file
 
 import names
-from backend.database_engine import SessionLocal, NametoUID
+from backend.database_engine import SessionLocal, NametoUID, init_db
 
 # -----------------------------
 # Config
@@ -42,4 +42,5 @@ def insert_new_names(count=x):
 # -----------------------------
 # Run the function
 # -----------------------------
+init_db()
 insert_new_names()
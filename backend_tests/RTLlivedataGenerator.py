@@ -4,7 +4,7 @@ import random
 import time
 from datetime import datetime
 import argparse
-from backend.database_engine import SessionLocal, RealtimeLocationData, NametoUID
+from backend.database_engine import SessionLocal, RealtimeLocationData, NametoUID, init_db
 
 # Constants
 MAX_STEP = 20  # maximum movement per update
@@ -80,6 +80,7 @@ def main():
         print("Duration must be a positive integer.")
         return
 
+    init_db()
     live_simulation(args.duration)
 
 if __name__ == '__main__':
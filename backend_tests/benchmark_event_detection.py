@@ -0,0 +1,280 @@
+"""
+benchmark_event_detection.py
+
+Stage-by-stage benchmark of event detection on fixed-seed synthetic data
+built with the generate_week_data scenario model (users, events per user,
+participants, sampling interval, background samples).
+
+Each scenario is timed per stage of run_event_detection:
+
+    fetch        proximity pairs (grid engine, or --engine sql)
+    grouping     connected components per timestamp
+    consolidate  merge consecutive groups into events
+    centroid     duration filter + event centroids
+    insert       event/session rows
+
+and then run a second time under tracemalloc for the peak memory of each
+stage (skip with --no-memory).
+
+Backends:
+  memory    samples live in a DataFrame and go through
+            backend.services.offline_detection. No database needed.
+  postgres  samples are inserted into realtime_location_data inside a
+            transaction that is rolled back at the end. Point DATABASE_URL
+            at a scratch database: rows already in the window are included.
+
+    python -m backend_tests.benchmark_event_detection --backend memory --json before.json
+    python -m backend_tests.benchmark_event_detection --backend memory --json after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from sqlalchemy import insert
+
+from backend.api import event_detection as ed
+from backend.services import offline_detection as offline
+from backend_tests.generate_week_data import (
+    AVG_PARTICIPANTS,
+    BACKGROUND_SAMPLES_PER_DAY,
+    EVENTS_PER_USER,
+    SAMPLING_INTERVAL_SEC,
+    generate_location_rows,
+)
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+SEED = 42
+STAGES = ["fetch", "grouping", "consolidate", "centroid", "insert"]
+
+# EVENTS_PER_USER in generate_week_data is per week; scenarios scale it by days
+SCENARIOS = {
+    "day-10": {"users": 10, "days": 1},
+    "week-100": {"users": 100, "days": 7},
+    "month-100": {"users": 100, "days": 30},
+    "week-1000": {"users": 1000, "days": 7},
+    "month-1000": {"users": 1000, "days": 30},
+    "day-1000": {"users": 1000, "days": 1},
+}
+DEFAULT_SCENARIOS = ["day-10", "day-1000", "week-100", "month-100", "week-1000"]
+
+# In-memory runs use a fixed calendar so results match between runs
+MEMORY_ANCHOR = datetime(2025, 1, 6)
+INSERT_BATCH_SIZE = 5000
+
+
+# ---------------------------
+# Scenario data
+# ---------------------------
+def build_scenario(name, seed, end):
+    params = SCENARIOS[name]
+    days = params["days"]
+    start = end - timedelta(days=days)
+    events_per_user = max(1, round(EVENTS_PER_USER * days / 7))
+
+    _, rows = generate_location_rows(
+        num_users=params["users"],
+        events_per_user=events_per_user,
+        avg_participants=AVG_PARTICIPANTS,
+        sampling_interval_sec=SAMPLING_INTERVAL_SEC,
+        background_samples_per_day=BACKGROUND_SAMPLES_PER_DAY,
+        week_start=start,
+        week_end=end,
+        seed=seed,
+        progress=False,
+    )
+
+    # Generated times are naive UTC, which normalize_samples assumes
+    samples = offline.normalize_samples(pd.DataFrame(rows, columns=offline.SAMPLE_COLUMNS))
+    info = {**params, "events_per_user": events_per_user, "seed": seed, "samples": len(samples)}
+    return samples, info
+
+
+# ---------------------------
+# In-memory backend
+# ---------------------------
+def memory_pipeline(samples):
+    return {
+        "fetch": lambda: offline.proximity_pairs(samples),
+        "centroid": lambda events: ed.locate_events(samples, events, centroids=offline.event_centroids),
+        "insert": lambda events: offline.number_events(events)[0],
+    }
+
+
+# ---------------------------
+# Postgres backend
+# ---------------------------
+def load_postgres(db, samples):
+    from backend.database_engine import RealtimeLocationData
+    from backend.services.partition_maintenance import ensure_partitions
+
+    conn = db.connection()
+    ensure_partitions(conn, samples["recorded_at"].min().date(), samples["recorded_at"].max().date())
+
+    table = RealtimeLocationData.__table__
+    records = [
+        {"id": int(i), "x_coordinate": float(x), "y_coordinate": float(y), "recorded_at": ts.to_pydatetime()}
+        for i, x, y, ts in samples.itertuples(index=False)
+    ]
+    for i in range(0, len(records), INSERT_BATCH_SIZE):
+        conn.execute(insert(table), records[i:i + INSERT_BATCH_SIZE])
+
+
+def postgres_pipeline(db, days, proximity_engine):
+    time_window = f"{days + 1} days"
+
+    def insert_stage(events):
+        # Savepoint so the memory pass inserts the same rows again
+        nested = db.begin_nested()
+        try:
+            return ed.write_events(db, events)
+        finally:
+            nested.rollback()
+
+    return {
+        "fetch": lambda: ed.get_proximity_data(db, time_window, 1, proximity_engine),
+        "centroid": lambda events: ed.locate_events(db, events),
+        "insert": insert_stage,
+    }
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+def run_pipeline(pipeline, measure_memory=False):
+    """Run every stage once; returns ({stage: seconds or peak MB}, counts)."""
+    results = {}
+
+    def stage(name, fn, *args):
+        if measure_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        out = fn(*args)
+        elapsed = time.perf_counter() - start
+        if measure_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = round(peak / 2**20, 2)
+        else:
+            results[name] = round(elapsed, 4)
+        return out
+
+    pairs = stage("fetch", pipeline["fetch"])
+    raw = stage("grouping", ed.group_connected_events, pairs) if not pairs.empty else []
+    consolidated = stage("consolidate", ed.consolidate_events, raw)
+    located = stage("centroid", pipeline["centroid"], consolidated)
+    written = stage("insert", pipeline["insert"], located)
+
+    counts = {
+        "pairs": len(pairs),
+        "raw_events": len(raw),
+        "consolidated": len(consolidated),
+        "located": len(located),
+        "written": len(written),
+    }
+    return results, counts
+
+
+def benchmark_scenario(name, backend, seed, proximity_engine, measure_memory):
+    if backend == "memory":
+        samples, info = build_scenario(name, seed, MEMORY_ANCHOR)
+        make_pipeline = lambda: memory_pipeline(samples)
+        db = None
+    else:
+        from backend.database_engine import get_sessionmaker, init_db
+
+        init_db()
+        end = datetime.now(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+        samples, info = build_scenario(name, seed, end)
+        db = get_sessionmaker()()
+        ed.lift_statement_timeout(db)
+        start = time.perf_counter()
+        load_postgres(db, samples)
+        info["load_sec"] = round(time.perf_counter() - start, 2)
+        make_pipeline = lambda: postgres_pipeline(db, info["days"], proximity_engine)
+
+    try:
+        timings, counts = run_pipeline(make_pipeline())
+        memory = run_pipeline(make_pipeline(), measure_memory=True)[0] if measure_memory else {}
+    finally:
+        if db is not None:
+            db.rollback()
+            db.close()
+
+    return {
+        "scenario": name,
+        **info,
+        **counts,
+        "stages": {s: {"sec": timings.get(s, 0.0), "peak_mb": memory.get(s)} for s in STAGES},
+        "total_sec": round(sum(timings.values()), 4),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_result(r, previous=None):
+    print(f"\n{r['scenario']}: {r['users']} tags, {r['days']} days, {r['samples']:,} samples, "
+          f"{r['pairs']:,} pairs, {r['written']:,} events")
+    print(f"  {'stage':<12} {'sec':>10} {'peak MB':>10}" + (f" {'vs prev':>9}" if previous else ""))
+    for s in STAGES + ["total"]:
+        sec = r["total_sec"] if s == "total" else r["stages"][s]["sec"]
+        peak = "" if s == "total" else r["stages"][s]["peak_mb"]
+        line = f"  {s:<12} {sec:>10.4f} {'' if peak is None else peak:>10}"
+        if previous:
+            old = previous["total_sec"] if s == "total" else previous["stages"][s]["sec"]
+            line += f" {old / sec if sec else float('inf'):>8.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event detection stages on synthetic scenarios.")
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help=f"repeatable (default: {' '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--engine", choices=["grid", "sql"], default=None, help="proximity engine (postgres only)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare against (speedup = old/new)")
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {r["scenario"]: r for r in json.load(f)["results"]}
+
+    results = []
+    for name in args.scenario or DEFAULT_SCENARIOS:
+        r = benchmark_scenario(name, args.backend, args.seed, args.engine, not args.no_memory)
+        results.append(r)
+        print_result(r, previous.get(name))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "backend": args.backend,
+                "proximity_engine": args.engine or ed.PROXIMITY_ENGINE,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
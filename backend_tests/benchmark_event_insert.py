@@ -0,0 +1,76 @@
+"""
+benchmark_event_insert.py
+
+Measure the bulk event/session writer (event_detection.write_events)
+against a local Postgres. Synthetic events are written inside a transaction
+that is rolled back at the end, so the database is left untouched.
+
+    python -m backend_tests.benchmark_event_insert --events 5000 --participants 4
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from backend.database_engine import engine, init_db
+from backend.api.event_detection import write_events
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+NUM_USERS = 100
+SEED = 7
+
+
+def make_events(num_events, participants, num_users=NUM_USERS):
+    """Synthetic consolidated events with centroids already attached."""
+    random.seed(SEED)
+    start = datetime.now() - timedelta(days=7)
+
+    events = []
+    for i in range(num_events):
+        ev_start = start + timedelta(seconds=i * 30)
+        events.append({
+            "start_time": ev_start,
+            "end_time": ev_start + timedelta(minutes=random.randint(1, 20)),
+            "users": random.sample(range(1, num_users + 1), participants),
+            "x_event": random.randint(4800, 5200),
+            "y_event": random.randint(4800, 5200),
+        })
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk event insertion.")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--participants", type=int, default=4)
+    args = parser.parse_args()
+
+    init_db()
+    events = make_events(args.events, args.participants)
+
+    with Session(engine) as session:
+        try:
+            start = time.perf_counter()
+            written = write_events(session, events)
+            session.flush()
+            elapsed = time.perf_counter() - start
+
+            rows = len(written) * (1 + args.participants)
+            print(f"Wrote {len(written)} events + {len(written) * args.participants} sessions "
+                  f"in {elapsed:.3f} sec ({rows / elapsed:,.0f} rows/sec)")
+
+            # Same batch again: every key exists, nothing may be written
+            start = time.perf_counter()
+            rewritten = write_events(session, events)
+            elapsed = time.perf_counter() - start
+            print(f"Re-run wrote {len(rewritten)} events in {elapsed:.3f} sec (idempotent: {not rewritten})")
+        finally:
+            session.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+benchmark_grouping.py
+
+Compare the per-timestamp networkx grouping with the vectorized union-find
+grouping on synthetic proximity frames (user_a, user_b, recorded_at).
+No database needed.
+
+    python -m backend_tests.benchmark_grouping --sizes 10000 100000 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.services.grouping import group_edges, group_edges_networkx
+
+# ---------------------------
+# CONFIG
+# ---------------------------
+NUM_USERS = 100
+EDGES_PER_TIMESTAMP = 8
+SEED = 42
+
+
+def make_edge_frame(num_rows, num_users=NUM_USERS, edges_per_ts=EDGES_PER_TIMESTAMP, seed=SEED):
+    """Random proximity edges (user_a < user_b), sorted by timestamp like the SQL output."""
+    rng = np.random.default_rng(seed)
+
+    a = rng.integers(1, num_users + 1, num_rows * 2)
+    b = rng.integers(1, num_users + 1, num_rows * 2)
+    keep = a != b
+    a, b = a[keep][:num_rows], b[keep][:num_rows]
+    user_a, user_b = np.minimum(a, b), np.maximum(a, b)
+
+    seconds = np.sort(rng.integers(0, max(1, num_rows // edges_per_ts), len(user_a)))
+    start = pd.Timestamp.now(tz="UTC").floor("s")
+    recorded_at = start + pd.to_timedelta(seconds, unit="s")
+
+    return pd.DataFrame({"user_a": user_a, "user_b": user_b, "recorded_at": recorded_at})
+
+
+def normalize(events):
+    return [(e["event_id"], e["timestamp"], sorted(e["users"])) for e in events]
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark proximity edge grouping.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'networkx s':>12} {'union-find s':>13} {'speedup':>8} {'events':>9} identical")
+    for size in args.sizes:
+        df = make_edge_frame(size)
+
+        nx_events, nx_time = time_call(group_edges_networkx, df)
+        uf_events, uf_time = time_call(group_edges, df["recorded_at"], df["user_a"], df["user_b"])
+
+        identical = normalize(nx_events) == normalize(uf_events)
+        print(
+            f"{len(df):>10} {nx_time:>12.3f} {uf_time:>13.3f} "
+            f"{nx_time / uf_time:>7.1f}x {len(uf_events):>9} {identical}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+benchmark_ingestion.py
+
+Replay fake MQTT position messages through RealTimeIngestion.on_message and
+compare the old per-message INSERT + commit with the queue + buffered writer
+pipeline. Rows go to a scratch copy of realtime_location_data that is
+dropped after.
+
+    python -m backend_tests.benchmark_ingestion --messages 20000 --workers 2
+"""
+
+import argparse
+import json
+import random
+import time
+
+from backend.database_engine import init_db
+from backend.services.RealTimeIngestion import TAG_ID_MAP, connect_db, on_message
+from backend.services.ingestion_queue import IngestionQueue, LocationWriterPool
+
+SCRATCH_TABLE = "bench_realtime_location_data"
+TOPIC_PREFIX = "silabs/aoa/position/positioning-test_room/"
+
+
+class FakeMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class PerMessageWriter:
+    """The pre-buffering behaviour: one INSERT and one commit per sample."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def put(self, sample):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                f"INSERT INTO {SCRATCH_TABLE} (id, x_coordinate, y_coordinate, recorded_at) "
+                "VALUES (%s, %s, %s, %s)",
+                sample,
+            )
+        self.conn.commit()
+
+
+def make_messages(count):
+    random.seed(1)
+    tags = list(TAG_ID_MAP)
+    return [
+        FakeMessage(
+            TOPIC_PREFIX + random.choice(tags),
+            json.dumps({"x": random.uniform(0, 50), "y": random.uniform(0, 50), "z": 0}).encode(),
+        )
+        for _ in range(count)
+    ]
+
+
+def replay(messages, queue, pool=None):
+    """Return (seconds spent in on_message, seconds until every sample is written)."""
+    userdata = {"queues": [queue], "downsampler": None}
+    start = time.perf_counter()
+    for msg in messages:
+        on_message(None, userdata, msg)
+    received = time.perf_counter() - start
+    if pool is not None:
+        pool.stop()
+    return received, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MQTT ingestion writes.")
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--max-rows", type=int, default=500)
+    parser.add_argument("--max-latency-ms", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=20_000)
+    parser.add_argument("--policy", default="block", choices=["block", "drop_oldest", "spill"])
+    args = parser.parse_args()
+
+    init_db()
+    messages = make_messages(args.messages)
+
+    conn = connect_db()
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        cur.execute(f"CREATE TABLE {SCRATCH_TABLE} (LIKE realtime_location_data)")
+    conn.commit()
+
+    try:
+        _, elapsed = replay(messages, PerMessageWriter(conn))
+        print(f"per-message commit: {args.messages / elapsed:>10,.0f} msg/sec ({elapsed:.2f} sec)")
+
+        queue = IngestionQueue(maxsize=args.queue_size, policy=args.policy, spill_path="bench_spill.jsonl")
+        pool = LocationWriterPool(
+            queue,
+            connect_db,
+            workers=args.workers,
+            max_rows=args.max_rows,
+            max_latency_ms=args.max_latency_ms,
+            table=SCRATCH_TABLE,
+        )
+        pool.start()
+        received, elapsed = replay(messages, queue, pool)
+        print(f"queued pipeline:    {args.messages / elapsed:>10,.0f} msg/sec ({elapsed:.2f} sec, "
+              f"callback side {args.messages / received:,.0f} msg/sec)")
+        print(f"  queue:   {queue.stats()}")
+        print(f"  writers: {pool.stats()}")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
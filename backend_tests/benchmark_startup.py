@@ -0,0 +1,90 @@
+"""
+benchmark_startup.py
+
+Time a cold `import backend.main` and the FastAPI startup handlers, each in
+a fresh interpreter, with and without schema initialisation
+(INIT_DB_ON_STARTUP). Importing must not touch the database; startup with
+init_db needs the configured DATABASE_URL to be reachable.
+
+    python -m backend_tests.benchmark_startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import backend.main as main
+t1 = time.perf_counter()
+result = {"import_sec": t1 - t0}
+if STARTUP:
+    async def run():
+        async with main.app.router.lifespan_context(main.app):
+            result["startup_sec"] = time.perf_counter() - t1
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(result))
+"""
+
+
+def run_child(startup, init_db):
+    env = {**os.environ, "INIT_DB_ON_STARTUP": "1" if init_db else "0"}
+    proc = subprocess.run(
+        [sys.executable, "-c", f"STARTUP = {startup}\n" + CHILD],
+        capture_output=True, text=True, env=env,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output"}
+    return json.loads(lines[-1])
+
+
+def summarize(samples, key):
+    values = [s[key] for s in samples if key in s]
+    if not values:
+        return None
+    return {"median_ms": round(1000 * statistics.median(values), 1), "max_ms": round(1000 * max(values), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend import and startup time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    scenarios = {
+        "import only": (False, False),
+        "startup, no init_db": (True, False),
+        "startup with init_db": (True, True),
+    }
+
+    results = {}
+    for name, (startup, init_db) in scenarios.items():
+        samples = [run_child(startup, init_db) for _ in range(args.runs)]
+        errors = sorted({s["error"] for s in samples if "error" in s})
+        results[name] = {
+            "import": summarize(samples, "import_sec"),
+            "startup": summarize(samples, "startup_sec"),
+            "errors": errors,
+        }
+        line = f"{name:<22} import {results[name]['import']}"
+        if startup:
+            line += f"  startup {results[name]['startup']}"
+        if errors:
+            line += f"  errors {errors}"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+check_sample_formats.py
+
+Checks that location samples saved with offline_detection.save_samples and
+loaded back give the same events and sessions through detect_events as the
+NPZ dump, for every format available here (CSV always, Parquet when pyarrow
+is installed). The first sample is cut to a whole second so the CSV mixes
+whole-second and fractional timestamps, as exports do.
+
+    python -m backend_tests.check_sample_formats --scenario day-10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+from backend.services import offline_detection as offline
+from backend_tests.benchmark_event_detection import MEMORY_ANCHOR, SCENARIOS, SEED, build_scenario
+
+
+def formats():
+    available = [".csv"]
+    try:
+        offline._require_pyarrow()
+        available.append(".parquet")
+    except ImportError:
+        pass
+    return available
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare event detection on saved sample formats.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="repeatable (default: day-10)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    all_identical = True
+    print(f"{'scenario':<12} {'format':<9} {'events':>7} {'sessions':>9} identical")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.scenario or ["day-10"]:
+            samples, _ = build_scenario(name, args.seed, MEMORY_ANCHOR)
+            samples.loc[0, "recorded_at"] = samples.loc[0, "recorded_at"].floor("s")
+
+            reference = os.path.join(tmp, f"{name}.npz")
+            offline.save_samples(samples, reference)
+            expected = offline.detect_events(reference)
+
+            for suffix in formats():
+                path = os.path.join(tmp, f"{name}{suffix}")
+                offline.save_samples(samples, path)
+                actual = offline.detect_events(path)
+                identical = actual == expected
+                all_identical &= identical
+                print(f"{name:<12} {suffix:<9} {len(actual['events']):>7} {len(actual['sessions']):>9} {identical}")
+
+    sys.exit(0 if all_identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,11 +13,12 @@ from sqlalchemy.orm import Session
 from tqdm import tqdm   # optional
 
 from backend.database_engine import (
-    SessionLocal, 
     RealtimeLocationData, 
     NametoUID, 
-    engine
+    get_engine,
+    init_db
 )
+from backend.services.partition_maintenance import ensure_partitions
 
 # ---------------------------
 # CONFIG
@@ -53,7 +54,7 @@ def random_point_around(center_x, center_y, radius):
 
 def ensure_users_exist(num_users):
     """Make sure NametoUID contains at least `num_users` entries."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         existing = session.query(NametoUID.id).order_by(NametoUID.id.desc()).first()
         max_id = existing.id if existing else 0
 
@@ -136,7 +137,8 @@ def generate_background_samples_for_user(uid, start, end, samples_per_day):
     Sparse non-event data: [(uid, x, y, recorded_at)]
     """
     pts = []
-    total_samples = samples_per_day * 7  # 1 per day
+    days = max(1, round((end - start).total_seconds() / 86400))
+    total_samples = samples_per_day * days
 
     for _ in range(total_samples):
         offset = random.randint(0, int((end - start).total_seconds()))
@@ -159,7 +161,11 @@ def bulk_insert_location_points(rows, batch_size=BATCH_SIZE):
     table = RealtimeLocationData.__table__
     inserted = 0
 
-    with engine.begin() as conn:
+    with get_engine().begin() as conn:
+        # Backfilled rows need their (past) partitions to exist
+        timestamps = [ts for _, _, _, ts in rows]
+        ensure_partitions(conn, min(timestamps).date(), max(timestamps).date())
+
         for i in range(0, len(rows), batch_size):
             chunk = rows[i:i + batch_size]
             dicts = [
@@ -181,35 +187,59 @@ def bulk_insert_location_points(rows, batch_size=BATCH_SIZE):
 # Main driver
 # ---------------------------
 
-def generate_week_of_data(
+def generate_location_rows(
     num_users=NUM_USERS,
     events_per_user=EVENTS_PER_USER,
     avg_participants=AVG_PARTICIPANTS,
     sampling_interval_sec=SAMPLING_INTERVAL_SEC,
     background_samples_per_day=BACKGROUND_SAMPLES_PER_DAY,
     week_start=WEEK_START,
-    week_end=WEEK_END
+    week_end=WEEK_END,
+    seed=None,
+    progress=True,
 ):
-    print("Ensuring NametoUID users exist...")
-    ensure_users_exist(num_users)
+    """
+    Build the scenario without touching the database: returns
+    (events, rows) with rows = [(uid, x, y, recorded_at), ...] shuffled.
+    The same seed always gives the same data.
+    """
+    if seed is not None:
+        random.seed(seed)
+    wrap = tqdm if progress else (lambda it: it)
 
-    print("Generating event schedule...")
     events = generate_event_schedule(num_users, events_per_user, avg_participants, week_start, week_end)
-    print(f"{len(events)} events planned")
 
     all_rows = []
-
-    print("Generating event points...")
-    for ev in tqdm(events):
+    for ev in wrap(events):
         pts = generate_location_points_for_event(ev, sampling_interval_sec)
         all_rows.extend(pts)
 
-    print("Generating background samples...")
-    for uid in tqdm(range(1, num_users + 1)):
+    for uid in wrap(range(1, num_users + 1)):
         pts = generate_background_samples_for_user(uid, week_start, week_end, background_samples_per_day)
         all_rows.extend(pts)
 
     random.shuffle(all_rows)
+    return events, all_rows
+
+
+def generate_week_of_data(
+    num_users=NUM_USERS,
+    events_per_user=EVENTS_PER_USER,
+    avg_participants=AVG_PARTICIPANTS,
+    sampling_interval_sec=SAMPLING_INTERVAL_SEC,
+    background_samples_per_day=BACKGROUND_SAMPLES_PER_DAY,
+    week_start=WEEK_START,
+    week_end=WEEK_END
+):
+    print("Ensuring NametoUID users exist...")
+    ensure_users_exist(num_users)
+
+    print("Generating events and location samples...")
+    events, all_rows = generate_location_rows(
+        num_users, events_per_user, avg_participants, sampling_interval_sec,
+        background_samples_per_day, week_start, week_end,
+    )
+    print(f"{len(events)} events planned")
 
     print(f"Inserting {len(all_rows)} rows into realtime_location_data...")
     inserted = bulk_insert_location_points(all_rows)
@@ -217,5 +247,6 @@ def generate_week_of_data(
 
 
 if __name__ == "__main__":
+    init_db()
     generate_week_of_data()
     print("Week data generation complete.")
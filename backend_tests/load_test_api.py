@@ -0,0 +1,112 @@
+"""
+load_test_api.py
+
+Hammer the dashboard's hot endpoints with concurrent clients and report
+requests/sec and latency per endpoint. Start the API first, then run this
+once against the old build and once against the new one with the same
+settings and compare:
+
+    uvicorn backend.main:app --port 8000
+    python -m backend_tests.load_test_api --base-url http://localhost:8000 \
+        --concurrency 50 --duration 20 --label async --json load_async.json
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Hot paths polled by the dashboard (path templates take user_id)
+ENDPOINTS = [
+    "/api/routes_events/users?user_id={user_id}",
+    "/api/routes_events/active-devices",
+    "/api/routes_events/events-today",
+    "/api/routes_events/low-interaction?threshold_hours=5",
+    "/api/routes_location/locations/",
+    "/api/routes_reports/{user_id}",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def worker(url, deadline, timeout, latencies, errors, lock):
+    local_latencies, local_errors = [], 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resp:
+                resp.read()
+            local_latencies.append(time.perf_counter() - start)
+        except (urllib.error.URLError, TimeoutError, ConnectionError):
+            local_errors += 1
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def load_endpoint(base_url, path, concurrency, duration, timeout):
+    url = base_url.rstrip("/") + path
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker, url, deadline, timeout, latencies, errors, lock)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "req_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(1000 * percentile(latencies, 50), 1),
+        "p95_ms": round(1000 * percentile(latencies, 95), 1),
+        "p99_ms": round(1000 * percentile(latencies, 99), 1),
+        "mean_ms": round(1000 * statistics.fmean(latencies), 1) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the SilverSync API hot endpoints.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per endpoint")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--endpoint", action="append", help="path to test instead of the defaults (repeatable)")
+    parser.add_argument("--label", default="", help="name for this run in the output")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    paths = [p.format(user_id=args.user_id) for p in (args.endpoint or ENDPOINTS)]
+
+    results = []
+    print(f"{'endpoint':<55} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for path in paths:
+        r = load_endpoint(args.base_url, path, args.concurrency, args.duration, args.timeout)
+        results.append(r)
+        print(f"{path:<55} {r['req_per_sec']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "label": args.label,
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "duration_sec": args.duration,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
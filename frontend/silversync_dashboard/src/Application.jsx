@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import "./App_style.css";
 
 export default function App() {
@@ -41,29 +41,6 @@ export default function App() {
     }
   };
 
-  // --------------------------------------------------------------------
-  // Load Low Interaction Users
-  // --------------------------------------------------------------------
-  useEffect(() => {
-    const fetchLowUsers = async () => {
-      try {
-        const res = await fetch(
-          `${backendUrl}/low-interaction?threshold_hours=${threshold}`
-        );
-        const data = await res.json();
-        setLowUsers(data);
-      } catch (err) {
-        console.error("Error fetching low users:", err);
-      }
-    };
-
-    if (activeTab === "overview") {
-      fetchLowUsers();
-      const interval = setInterval(fetchLowUsers, 5000);
-      return () => clearInterval(interval);
-    }
-  }, [threshold, activeTab]);
-
   // --------------------------------------------------------------------
   // User Search
   // --------------------------------------------------------------------
@@ -109,32 +86,45 @@ export default function App() {
   }, []);
 
   // --------------------------------------------------------------------
-  // Overview Cards
+  // Overview Cards + Low Interaction Users
+  // One /overview request every 5s; the server answers 304 (no body)
+  // while nothing has changed since the ETag we already have.
   // --------------------------------------------------------------------
+  const overviewEtag = useRef(null);
+
   useEffect(() => {
-    const fetchOverviewData = async () => {
+    overviewEtag.current = null;  // new threshold, new response
+
+    const fetchOverview = async () => {
       try {
-        const resDevices = await fetch(`${backendUrl}/active-devices`);
-        const dataDevices = await resDevices.json();
-        setActiveDevices(dataDevices.active_devices ?? 0);
+        const headers = overviewEtag.current
+          ? { "If-None-Match": overviewEtag.current }
+          : {};
+        const res = await fetch(
+          `${backendUrl}/overview?threshold_hours=${threshold}`,
+          { headers, cache: "no-store" }
+        );
+        if (res.status === 304) return;
 
-        const resEvents = await fetch(`${backendUrl}/events-today`);
-        const dataEvents = await resEvents.json();
-        setEventsToday(dataEvents.events_today ?? 0);
+        const data = await res.json();
+        overviewEtag.current = res.headers.get("ETag");
 
-        const resStatus = await fetch(`${backendUrl}/system-status`);
-        const dataStatus = await resStatus.json();
-        setSystemStatus(dataStatus.status === "online" ? "online" : "offline");
+        setActiveDevices(data.active_devices ?? 0);
+        setEventsToday(data.events_today ?? 0);
+        setSystemStatus(data.system_status === "online" ? "online" : "offline");
+        setLowUsers(data.low_interaction ?? []);
       } catch (err) {
         console.error("Error fetching overview data:", err);
         setSystemStatus("offline");
       }
     };
 
-    fetchOverviewData();
-    const interval = setInterval(fetchOverviewData, 10000);
-    return () => clearInterval(interval);
-  }, []);
+    if (activeTab === "overview") {
+      fetchOverview();
+      const interval = setInterval(fetchOverview, 5000);
+      return () => clearInterval(interval);
+    }
+  }, [threshold, activeTab]);
 
   // --------------------------------------------------------------------
   // Generate Report Button
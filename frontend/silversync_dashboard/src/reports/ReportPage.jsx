@@ -75,7 +75,7 @@ export default function ReportPage() {
       <p>This Month: {report.socialization.month_hours} hours</p>
 
       {/* EVENTS */}
-      <h2 style={{ marginTop: "30px" }}>Major Events (4+ participants)</h2>
+      <h2 style={{ marginTop: "30px" }}>Major Events (4+ participants, most recent 50)</h2>
       <table style={{ width: "80%", margin: "auto", borderCollapse: "collapse" }}>
         <thead>
           <tr style={{ background: "#eef1f5" }}>
@@ -113,7 +113,7 @@ export default function ReportPage() {
       {/* -------------------------------- */}
       {/* MOBILITY MAP                     */}
       {/* -------------------------------- */}
-      <h2 style={{ marginTop: "40px" }}>Mobility Map</h2>
+      <h2 style={{ marginTop: "40px" }}>Mobility Map (last 7 days)</h2>
 
       <div
         ref={mapWrapperRef}
@@ -5,6 +5,7 @@ setup(
     version="0.1",
     packages=find_packages(),
     install_requires=[
+        "asyncpg==0.30.0",
         "blinker==1.9.0",
         "click==8.3.0",
         "colorama==0.4.6",